@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+""" Asyncio drawing engines """
+import asyncio
+from collections import deque
+import drawing_engine
+from lineus_transport import GCodeRecorder, LineUsError
+
+
+class AsyncDrawEngine:
+    """Asynchronous drawing engine base class"""
+
+    async def draw_line(self, p0, p1=None):
+        """Draw a line between p0 and p1 or between the current position and p0"""
+        raise NotImplementedError
+
+    async def set_pos(self, p):
+        """Set current pen position"""
+        raise NotImplementedError
+
+    async def draw_polyline(self, points, progress=None):
+        """Lower pen on the first point then draw a line between each
+        point in sequence. progress is called with (points done, total)"""
+        await self.set_pos(points[0])
+        for i in range(1, len(points)):
+            await self.draw_line(points[i])
+            if progress is not None:
+                progress(i + 1, len(points))
+
+    async def show(self):
+        """Display the drawing"""
+
+
+class AsyncPilDrawEngine(AsyncDrawEngine):
+    """PilDrawEngine adapted to asyncio. PIL drawing does not block
+    for long, so other tasks are only given a chance to run every
+    yield_every segments of a polyline. The image is saved to output
+    when set, shown in a viewer otherwise"""
+
+    def __init__(self, bounds, output=None, yield_every=256):
+        self.engine = drawing_engine.PilDrawEngine(bounds, output)
+        self.bounds = bounds
+        self.yield_every = yield_every
+
+    async def draw_line(self, p0, p1=None):
+        """Draw a line between p0 and p1 or between the current position and p0"""
+        self.engine.draw_line(p0, p1)
+
+    async def set_pos(self, p):
+        """Set current position"""
+        self.engine.set_pos(p)
+
+    async def draw_polyline(self, points, progress=None):
+        """Draw a polyline in runs of yield_every segments, each drawn by
+        a single PIL call, letting other tasks run between runs"""
+        for start in range(0, max(1, len(points) - 1), self.yield_every):
+            # Runs share their end points, so that they are joined
+            run = points[start : start + self.yield_every + 1]
+            self.engine.draw_polyline(run)
+            if progress is not None:
+                progress(start + len(run), len(points))
+            await asyncio.sleep(0)
+
+    async def show(self):
+        """Show our canvas, or save it to output"""
+        self.engine.show()
+
+
+class AsyncLineUsDrawEngine(AsyncDrawEngine):
+    """Line-us drawing engine using asyncio streams. Up to window
+    commands are kept in flight. Commands are generated by a
+    LineUsDrawEngine writing to a GCodeRecorder, so the same command
+    stream as the blocking engine is sent.
+    If a drawing task is cancelled, the pen is raised before the
+    cancellation is propagated"""
+
+    def __init__(self, host="line-us.local", port=1337, window=8, compact=True):
+        self.host = host
+        self.port = port
+        self.window = window
+        self.compiler = drawing_engine.LineUsDrawEngine(
+            compact=compact, transport=GCodeRecorder()
+        )
+        self.bounds = self.compiler.bounds
+        self.reader, self.writer = None, None
+        self.hello = None
+        self.in_flight = deque()
+        self.acked = 0
+
+    async def connect(self):
+        """Connect and read the hello message"""
+        (self.reader, self.writer) = await asyncio.open_connection(self.host, self.port)
+        self.hello = await self._read_response()
+
+    async def close(self):
+        """Wait for the commands in flight, then disconnect"""
+        if self.writer is not None:
+            await self.flush()
+            self.writer.close()
+            await self.writer.wait_closed()
+        self.reader, self.writer = None, None
+
+    async def draw_line(self, p0, p1=None):
+        """Draw a line between p0 and p1 or between the current position and p0"""
+        self.compiler.draw_line(p0, p1)
+        await self._send_compiled()
+
+    async def set_pos(self, p):
+        """Raise stylus, move head, lower stylus"""
+        self.compiler.set_pos(p)
+        await self._send_compiled()
+
+    async def draw_polyline(self, points, progress=None):
+        """Draw a polyline. progress is called with (points done, total)
+        once the commands of each point have been sent"""
+        self.compiler.set_pos(points[0])
+        await self._send_compiled()
+        for i in range(1, len(points)):
+            self.compiler.draw_line(points[i])
+            await self._send_compiled()
+            if progress is not None:
+                progress(i + 1, len(points))
+
+    async def send_lines(self, lines, progress=None):
+        """Send raw G-code lines, e.g. read from a file written by the
+        gcode engine. progress is called with (lines done, total)"""
+        try:
+            for i, cmd in enumerate(lines):
+                await self._send(cmd)
+                if progress is not None:
+                    progress(i + 1, len(lines))
+        except asyncio.CancelledError:
+            await self._abort()
+            raise
+        # Pen state and position are not tracked when sending raw lines
+        self.compiler.pen_up, self.compiler.head_pos = None, None
+
+    async def reset_position(self):
+        """Moves lineus back to its reset position"""
+        self.compiler.reset_position()
+        await self._send_compiled()
+
+    async def show(self):
+        """Wait for the commands in flight"""
+        await self.flush()
+
+    async def flush(self):
+        """Wait until all commands in flight have been acknowledged"""
+        while self.in_flight:
+            await self._wait_ack()
+
+    async def _send_compiled(self):
+        """Send the commands generated by the compiler. On cancellation,
+        raise the pen"""
+        lines = self.compiler.lineus.lines
+        self.compiler.lineus.lines = []
+        try:
+            for cmd in lines:
+                await self._send(cmd)
+        except asyncio.CancelledError:
+            await self._abort()
+            raise
+
+    async def _abort(self):
+        """Raise the pen, ignoring the answers of the commands in flight"""
+        self.compiler.lineus.lines = []
+        # Some compiled moves might not have been sent
+        self.compiler.pen_up, self.compiler.head_pos = True, None
+        if self.writer is None:
+            return
+        await self._send("G01 Z" + str(self.compiler.LINEUS_HIGH_Z))
+        try:
+            await self.flush()
+        except LineUsError:
+            pass
+
+    async def _send(self, cmd):
+        """Send a command, waiting for acknowledgements first
+        if the window is full"""
+        while len(self.in_flight) >= self.window:
+            await self._wait_ack()
+        self.writer.write(cmd.encode() + b"\x00")
+        self.in_flight.append(cmd)
+        await self.writer.drain()
+
+    async def _wait_ack(self):
+        """Read the response to the oldest command in flight"""
+        response = await self._read_response()
+        cmd = self.in_flight.popleft()
+        if response.startswith("error"):
+            in_flight = list(self.in_flight)
+            while self.in_flight:
+                await self._read_response()
+                self.in_flight.popleft()
+            raise LineUsError(cmd, response, in_flight)
+        self.acked += 1
+        return response
+
+    async def _read_response(self):
+        """Read a null terminated response"""
+        line = await self.reader.readuntil(b"\x00")
+        return line[:-1].decode("utf-8").rstrip("\r\n")
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """ Lineus and PIL drawing engine """
-from math import copysign
+from itertools import islice
+from math import copysign, cos, isfinite, radians, sin
 import sys
+from point_buffer import PointBuffer
 
 
 class DrawEngine:
@@ -15,6 +17,14 @@ class DrawEngine:
         """Set current pen position"""
         raise NotImplementedError
 
+    def draw_polyline(self, points):
+        """Lower pen on the first point then draw a line between each
+        point in sequence. Engines able to draw a whole run at once
+        override this default, which draws the segments one by one"""
+        self.set_pos(points[0])
+        for p in points[1:]:
+            self.draw_line(p)
+
     def show(self):
         """Display the drawing"""
 
@@ -22,11 +32,13 @@ class DrawEngine:
 class PilDrawEngine(DrawEngine):
     """Drawing engine based on Python Image Library"""
 
-    def __init__(self, bounds):
-        """bounds is the canvas boundsing box: (x0, y0, x1, y1) format"""
+    def __init__(self, bounds, output=None):
+        """bounds is the canvas boundsing box: (x0, y0, x1, y1) format.
+        The image is saved to output when set, shown in a viewer otherwise"""
         from PIL import Image, ImageDraw
 
         self.bounds = bounds
+        self.output = output
         self.im = Image.new(
             "RGB",
             (abs(bounds[2] - bounds[0]), abs(bounds[3] - bounds[1])),
@@ -48,9 +60,21 @@ class PilDrawEngine(DrawEngine):
             self.draw.line(p0 + p1, fill=(0, 0, 0))
             self.pos = p1
 
+    def draw_polyline(self, points):
+        """Draw a polyline with a single PIL call"""
+        points = points if isinstance(points, list) else list(points)
+        if len(points) == 1:
+            self.set_pos(points[0])
+            return
+        self.draw.line(points, fill=(0, 0, 0), joint="curve")
+        self.pos = points[-1]
+
     def show(self):
-        """Show our canvas"""
-        self.im.show()
+        """Show our canvas, or save it"""
+        if self.output is None:
+            self.im.show()
+        else:
+            self.im.save(self.output)
 
 
 class LineUsDrawEngine(DrawEngine):
@@ -60,70 +84,247 @@ class LineUsDrawEngine(DrawEngine):
     LINEUS_LOW_Z = 200
     LINEUS_CANVAS = (650, -1000, 1775, 1000)
 
-    def __init__(self, bounds=LINEUS_CANVAS):
-        from lineus import LineUs
-
-        self.lineus = LineUs()
+    LINEUS_SLOT_SIZE = 65536
+
+    def __init__(
+        self,
+        bounds=LINEUS_CANVAS,
+        compact=True,
+        transport=None,
+        upload_slot=None,
+        slot_size=LINEUS_SLOT_SIZE,
+    ):
+        """When compact is True, commands that would not change the
+        pen state or the (rounded) head position are not sent.
+        transport defaults to the lineus library client. Any object with
+        the same connect/g01/send_gcode methods can be used instead, e.g.
+        lineus_transport.LineUsClient to keep several commands in flight.
+        When upload_slot is set, the drawing is compiled and uploaded
+        to Line-us memory on show(), starting at this slot and using
+        more slots if it does not fit in slot_size bytes"""
+        from lineus_transport import GCodeRecorder
+
+        if transport is None:
+            from lineus import LineUs
+
+            transport = LineUs()
+        self.lineus = transport
         self.bounds = bounds
+        self.compact = compact
+        self.pen_up = None  # Unknown until the first Z move
+        self.head_pos = None  # Unknown until the first X/Y move
+        self.sent = 0
+        self.dropped = {"z": 0, "move": 0}
         if not self.lineus.connect():
             raise Exception("Can't connect to Line-us")
+        self.upload_slot = upload_slot
+        self.slot_size = slot_size
+        if upload_slot is not None:
+            self.uplink = self.lineus
+            self.lineus = GCodeRecorder()
+
+    @staticmethod
+    def quantize(p):
+        """Round coordinates - seems the API has issues with
+        at least coordinates between -1 and 1"""
+        return tuple(round(x, 0) for x in p)
 
     def raise_stylus(self):
         """Raise lineus head"""
+        if self.compact and self.pen_up is True:
+            self.dropped["z"] += 1
+            return
         self.lineus.g01(z=self.LINEUS_HIGH_Z)
+        self.sent += 1
+        self.pen_up = True
 
     def lower_stylus(self):
         """lower lineus head"""
+        if self.compact and self.pen_up is False:
+            self.dropped["z"] += 1
+            return
         self.lineus.g01(z=self.LINEUS_LOW_Z)
+        self.sent += 1
+        self.pen_up = False
 
     def move(self, p):
         """Move lineus head in x, y plane. This might trace
         something or not, if the stylus is up or down"""
-        # Round coordinates - seems the API has issues with
-        # at least coordinates between -1 and 1
-        s_p = [round(x, 0) for x in p]
+        s_p = self.quantize(p)
+        if self.compact and s_p == self.head_pos:
+            self.dropped["move"] += 1
+            return
         self.lineus.g01(*s_p)
+        self.sent += 1
+        self.head_pos = s_p
 
     def set_pos(self, p):
         """Raise style, move head, lower stylus"""
-        self.raise_stylus()
-        self.move(p)
+        if self.compact and self.quantize(p) == self.head_pos:
+            # Already there: no need to lift the pen
+            self.dropped["z"] += 1
+            self.dropped["move"] += 1
+        else:
+            self.raise_stylus()
+            self.move(p)
         self.lower_stylus()
 
     def reset_position(self):
         """Moves lineus back to its reset position"""
         self.lineus.send_gcode("G28")
+        self.sent += 1
+        self.pen_up, self.head_pos = None, None
 
     def draw_line(self, p0, p1=None):
         """Draw a line between p0 and p1 or between the current position and p0"""
-        if p1 is None:
-            self.move(p0)
-        else:
-            self.raise_stylus()
-            self.move(p0)
-            self.lower_stylus()
-            self.move(p1)
+        if p1 is not None:
+            self.set_pos(p0)
+            p0 = p1
+        self.move(p0)
+
+    def show(self):
+        """Wait for pending commands (or upload the compiled drawing),
+        then report the number of commands sent and dropped"""
+        if self.upload_slot is not None:
+            self.upload()
+        if hasattr(self.lineus, "flush"):
+            self.lineus.flush()
+        if hasattr(self.lineus, "report"):
+            print(self.lineus.report(), file=sys.stderr)
+        print(
+            "Line-us: %d commands sent, %d Z moves and %d moves dropped"
+            % (self.sent, self.dropped["z"], self.dropped["move"]),
+            file=sys.stderr,
+        )
+
+    def upload(self):
+        """Upload the compiled drawing to Line-us memory slots"""
+        from lineus_transport import split_slots, upload
+
+        chunks = split_slots(self.lineus.lines, self.slot_size, self.LINEUS_HIGH_Z)
+        (size, elapsed) = upload(self.uplink, chunks, self.upload_slot)
+        print(
+            "Line-us: uploaded %d bytes to slot(s) %d-%d in %.2fs"
+            % (size, self.upload_slot, self.upload_slot + len(chunks) - 1, elapsed),
+            file=sys.stderr,
+        )
+        self.lineus.lines = []
 
     def start_recording(self, slot):
         """Start move recording in the requested memory slot"""
         if not isinstance(slot, int) or slot < 1 or slot > 32:
             raise Exception("Incorrect slot number (must be int between 1 and 32)")
         self.lineus.send_gcode("M28", "S" + str(slot))
+        self.sent += 1
 
     def stop_recording(self):
         """Stop recording - save file"""
         self.lineus.send_gcode("M29")
+        self.sent += 1
 
 
-def fit_func_factory(from_box, to_box):
-    """Return a function transforming coordinates to center
-    a figure contained in from_box, when projecting it
-    inside to_box, so that it takes as much space as possible
-    while keeping its aspect ratio.
-    Also, invert the x and y axis if needed"""
+class GCodeFileDrawEngine(LineUsDrawEngine):
+    """Drawing engine writing the Line-us command stream to a file,
+    one command per line, to be replayed later with replay.py"""
+
+    def __init__(self, filename, bounds=LineUsDrawEngine.LINEUS_CANVAS, compact=True):
+        from lineus_transport import GCodeRecorder
+
+        self.filename = filename
+        self.file = open(filename, "w", encoding="utf-8")
+        super().__init__(bounds, compact, GCodeRecorder(self.file))
+
+    def show(self):
+        """Close the file"""
+        self.file.close()
+        print(
+            "%s: %d commands written, %d Z moves and %d moves dropped"
+            % (self.filename, self.sent, self.dropped["z"], self.dropped["move"]),
+            file=sys.stderr,
+        )
+
+
+class Transform:
+    """2D affine transform, mapping (x, y) to
+    (a * x + b * y + c, d * x + e * y + f).
+    translate, scale, rotate and flip return a new transform applying
+    this one, then the requested operation. t1 @ t2 applies t2, then t1.
+    Calling a transform maps a single point, apply maps a sequence of
+    points, a PointBuffer or a numpy array of shape (n, 2) in one call"""
+
+    def __init__(self, matrix=(1, 0, 0, 0, 1, 0)):
+        self.matrix = tuple(matrix)
+
+    def __matmul__(self, other):
+        (a, b, c, d, e, f) = self.matrix
+        (o_a, o_b, o_c, o_d, o_e, o_f) = other.matrix
+        return Transform(
+            (
+                a * o_a + b * o_d,
+                a * o_b + b * o_e,
+                a * o_c + b * o_f + c,
+                d * o_a + e * o_d,
+                d * o_b + e * o_e,
+                d * o_c + e * o_f + f,
+            )
+        )
+
+    def translate(self, dx, dy):
+        """Then translate by (dx, dy)"""
+        return Transform((1, 0, dx, 0, 1, dy)) @ self
+
+    def scale(self, sx, sy=None):
+        """Then scale by sx horizontally and sy (default sx) vertically"""
+        return Transform((sx, 0, 0, 0, sx if sy is None else sy, 0)) @ self
+
+    def rotate(self, angle):
+        """Then rotate counterclockwise around the origin, angle in degrees"""
+        (c, s) = (cos(radians(angle)), sin(radians(angle)))
+        return Transform((c, -s, 0, s, c, 0)) @ self
+
+    def flip(self, x=False, y=False):
+        """Then invert the x and/or y axis"""
+        return self.scale(-1 if x else 1, -1 if y else 1)
+
+    def __call__(self, p):
+        (a, b, c, d, e, f) = self.matrix
+        return (a * p[0] + b * p[1] + c, d * p[0] + e * p[1] + f)
+
+    def apply(self, points):
+        """Transform all points. Returns a numpy array for a numpy
+        array, a PointBuffer for a PointBuffer, a list of (x, y)
+        tuples otherwise"""
+        if isinstance(points, PointBuffer):
+            return points.transform(self)
+        (a, b, c, d, e, f) = self.matrix
+        if hasattr(points, "shape"):  # numpy array
+            if points.dtype.kind != "f":  # Not to truncate the matrix
+                points = points.astype(float)
+            return points @ points.dtype.type((a, d, b, e)).reshape(2, 2) + (c, f)
+        return [(a * x + b * y + c, d * x + e * y + f) for (x, y) in points]
+
+    def bounds(self, box):
+        """Bounding box (x0, y0, x1, y1) of a transformed box"""
+        (x0, y0, x1, y1) = box
+        corners = self.apply(((x0, y0), (x0, y1), (x1, y0), (x1, y1)))
+        (xs, ys) = zip(*corners)
+        return (min(xs), min(ys), max(xs), max(ys))
+
+
+def fit_transform(from_box, to_box):
+    """Return a transform centering a figure contained in from_box,
+    when projecting it inside to_box, so that it takes as much space
+    as possible while keeping its aspect ratio.
+    Also, invert the x and y axis if needed.
+    Raises ValueError if from_box has a null or infinite width or height"""
     (x0_from, y0_from, x1_from, y1_from) = from_box
     (x0_to, y0_to, x1_to, y1_to) = to_box
     (w_from, h_from) = (x1_from - x0_from, y1_from - y0_from)
+    if w_from == 0 or h_from == 0 or not isfinite(w_from * h_from):
+        raise ValueError(
+            "Can't fit a drawing of null or infinite width or height, "
+            + "bounding box %s" % (tuple(from_box),)
+        )
     (w_to, h_to) = (x1_to - x0_to, y1_to - y0_to)
     (a_from, a_to) = (abs(w_from / h_from), abs(w_to / h_to))
 
@@ -136,34 +337,332 @@ def fit_func_factory(from_box, to_box):
         xscale = copysign(yscale, w_to * w_from)
         trans = (x0_to + (w_to - w_from * xscale) / 2, y0_to)
 
-    return lambda p: (
-        trans[0] + xscale * (p[0] - x0_from),
-        trans[1] + yscale * (p[1] - y0_from),
+    return (
+        Transform()
+        .translate(-x0_from, -y0_from)
+        .scale(xscale, yscale)
+        .translate(trans[0], trans[1])
     )
 
 
-def draw_continuous(points, canvas, engine):
-    """Continuous drawing: lower pen on the first point then
-    draw line between each point in sequence."""
-    engine_params = {
-        "pil": {"bounds": canvas, "eng": PilDrawEngine},
-        "lineus": {"bounds": LineUsDrawEngine.LINEUS_CANVAS, "eng": LineUsDrawEngine},
+def fit_func_factory(from_box, to_box):
+    """Return a function transforming coordinates to center
+    a figure contained in from_box, when projecting it
+    inside to_box. See fit_transform"""
+    return fit_transform(from_box, to_box)
+
+
+def bounding_box(points):
+    """Get the (x0, y0, x1, y1) bounding box of points, in a single
+    pass over any iterable of points"""
+    if isinstance(points, PointBuffer):
+        return points.bounds()
+    if hasattr(points, "shape"):  # numpy array
+        return (*points.min(axis=0), *points.max(axis=0))
+    p_iter = iter(points)
+    (minx, miny) = (maxx, maxy) = next(p_iter)
+    for (x, y) in p_iter:
+        if x < minx:
+            minx = x
+        elif x > maxx:
+            maxx = x
+        if y < miny:
+            miny = y
+        elif y > maxy:
+            maxy = y
+    return (minx, miny, maxx, maxy)
+
+
+def chunked(points, size):
+    """Split an iterable of points in lists (or views for a numpy
+    array or a PointBuffer) of at most size points"""
+    if hasattr(points, "shape") or isinstance(points, PointBuffer):
+        for i in range(0, len(points), size):
+            yield points[i : i + size]
+        return
+    p_iter = iter(points)
+    chunk = list(islice(p_iter, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(p_iter, size))
+
+
+def to_tuples(points):
+    """Get transformed points as a sequence of (x, y) tuples"""
+    if isinstance(points, PointBuffer):
+        return points.tolist()
+    if hasattr(points, "tolist"):  # numpy array
+        return [tuple(p) for p in points.tolist()]
+    return points
+
+
+ENGINES = ("pil", "lineus", "gcode", "svg", "pdf", "tiled")
+
+
+def add_engine_arguments(parser):
+    """Add the drawing engine options to an argparse parser"""
+    parser.add_argument(
+        "-e",
+        "--engine",
+        help="Drawing engine",
+        default="pil",
+        type=str,
+        choices=ENGINES,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Output file: image file of the pil engine (shown in a viewer "
+        + "if not set), file written by the gcode, svg and pdf engines "
+        + "(default drawing.gcode, drawing.svg, drawing.pdf)",
+        type=str,
+    )
+    parser.add_argument(
+        "--host",
+        help="Line-us host name or address (e.g. a local simulator). "
+        + "Line-us is searched on the network if not set",
+        type=str,
+    )
+    parser.add_argument(
+        "--port",
+        help="Line-us TCP port",
+        default=1337,
+        type=int,
+    )
+    parser.add_argument(
+        "--window",
+        help="Number of Line-us commands sent before waiting for an answer",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "--journal",
+        help="Record the progress of the drawing in this file, "
+        + "to be able to resume it if interrupted",
+        type=str,
+    )
+    parser.add_argument(
+        "--resume",
+        help="Resume the drawing recorded in the journal file",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--dry-run",
+        help="Do not draw, estimate the Line-us plot time instead",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--slot",
+        help="Compile the drawing and upload it to Line-us memory, "
+        + "starting at this slot (1-32) and using more slots if needed",
+        type=int,
+    )
+    parser.add_argument(
+        "--tile-size",
+        help="Tile side of the tiled engine, in pixels. Tiles are rendered in "
+        + "parallel, and written one by one if -o contains %%d twice",
+        default=2048,
+        type=int,
+    )
+    parser.add_argument(
+        "--mono",
+        help="Render 1 bit per pixel images with the tiled engine",
+        action="store_true",
+    )
+
+
+def add_drawing_arguments(parser):
+    """Add the drawing options (rotation, polyline simplification)
+    to an argparse parser"""
+    from simplify import METHODS
+
+    parser.add_argument(
+        "--rotate",
+        help="Rotate the drawing counterclockwise, in degrees",
+        default=0,
+        type=float,
+    )
+    parser.add_argument(
+        "--simplify",
+        help="Remove points not needed to stay within tolerance of the curve",
+        type=str,
+        choices=METHODS,
+    )
+    parser.add_argument(
+        "--tolerance",
+        help="Simplification tolerance, in engine units (pixels or Line-us units)",
+        default=1.0,
+        type=float,
+    )
+
+
+def drawing_options(args):
+    """Get draw_continuous options from parsed arguments"""
+    return {
+        "rotation": args.rotate,
+        "simplify": args.simplify,
+        "tolerance": args.tolerance,
+    }
+
+
+def engine_options(args):
+    """Get get_draw_engine options from parsed arguments"""
+    return {
+        "output": args.output,
+        "host": args.host,
+        "port": args.port,
+        "window": args.window,
+        "slot": args.slot,
+        "dry_run": args.dry_run,
+        "journal": args.journal,
+        "resume": args.resume,
+        "tile_size": args.tile_size,
+        "mono": args.mono,
     }
-    engine_param = engine_params.get(engine)
-    try:
-        draw_engine = engine_param["eng"](engine_param["bounds"])
-    except TypeError:
-        print("Invalid drawing engine passed. Exiting", file=sys.stderr)
-        sys.exit(-1)
-
-    (maxx, maxy) = map(max, zip(*points))
-    (minx, miny) = map(min, zip(*points))
-
-    fit_func = fit_func_factory((minx, miny, maxx, maxy), draw_engine.bounds)
-
-    p0 = fit_func(points[0])
-    draw_engine.set_pos(p0)
-    for p in points[1:]:
-        draw_engine.draw_line(fit_func(p))
-    draw_engine.draw_line(p0)
+
+
+def get_draw_engine(
+    engine,
+    canvas,
+    output=None,
+    host=None,
+    port=1337,
+    window=1,
+    slot=None,
+    dry_run=False,
+    journal=None,
+    resume=False,
+    tile_size=2048,
+    mono=False,
+):
+    """Create a drawing engine by name. canvas is only used
+    by the engines not having a fixed drawing area.
+    output is the file the raster and vector engines write to.
+    With dry_run, a Line-us engine estimating the plot time
+    is returned whatever the engine.
+    journal and resume are ResumableLineUs options,
+    tile_size and mono TiledPilDrawEngine ones"""
+    if dry_run:
+        from plot_estimator import PlotEstimator
+
+        return LineUsDrawEngine(transport=PlotEstimator(window=window))
+    if engine == "pil":
+        return PilDrawEngine(canvas, output)
+    if engine == "lineus":
+        transport = None
+        if host is not None or window > 1 or journal is not None:
+            from lineus_transport import LineUsClient, ResumableLineUs, discover
+
+            if host is None:
+                (host, port) = discover()
+            transport = ResumableLineUs(
+                LineUsClient(host, port, window),
+                journal,
+                resume,
+                LineUsDrawEngine.LINEUS_HIGH_Z,
+            )
+        return LineUsDrawEngine(transport=transport, upload_slot=slot)
+    if engine == "gcode":
+        return GCodeFileDrawEngine(output or "drawing.gcode")
+    if engine in ("svg", "pdf"):
+        from vector_engine import PdfDrawEngine, SvgDrawEngine
+
+        cls = SvgDrawEngine if engine == "svg" else PdfDrawEngine
+        return cls(canvas, output or "drawing." + engine)
+    if engine == "tiled":
+        from tiled_engine import TiledPilDrawEngine
+
+        return TiledPilDrawEngine(canvas, output, tile_size, "1" if mono else "RGB")
+    print("Invalid drawing engine passed. Exiting", file=sys.stderr)
+    sys.exit(-1)
+
+
+STREAM_CHUNK = 4096
+
+
+def draw_continuous(points, canvas, engine, **options):
+    """Continuous drawing with a new engine, see trace_continuous.
+    options are passed to trace_continuous, or else to get_draw_engine"""
+    trace_options = {
+        k: options.pop(k)
+        for k in ("rotation", "simplify", "tolerance", "bbox", "closed")
+        if k in options
+    }
+    draw_engine = get_draw_engine(engine, canvas, **options)
+    trace_continuous(points, draw_engine, **trace_options)
     draw_engine.show()
+
+
+def trace_continuous(
+    points,
+    draw_engine,
+    rotation=0,
+    simplify=None,
+    tolerance=1.0,
+    bbox=None,
+    closed=True,
+):
+    """Continuous drawing: lower pen on the first point then
+    draw line between each point in sequence, and back to the first
+    point if closed. The drawing is fitted to draw_engine bounds.
+    points is a sequence, PointBuffer or numpy array of points, or a function
+    returning a new iterable of chunks of the same points (sequences,
+    PointBuffers or numpy arrays) each time it is called.
+    In the latter case points are streamed in constant memory: a first
+    pass computes their bounding box, unless given in bbox, and the
+    second one draws them, each chunk being transformed at once. Other
+    iterables are read once when bbox is given, made a list otherwise.
+    The drawing is rotated by rotation degrees counterclockwise.
+    If simplify is one of simplify.METHODS, points are removed as long
+    as the drawing stays within tolerance (in engine units) of the
+    original one. This needs all the points in memory"""
+    rotate = Transform().rotate(rotation)
+
+    if bbox is not None:
+        bbox = rotate.bounds(bbox)
+    elif callable(points):
+        boxes = [
+            bounding_box(rotate.apply(chunk) if rotation else chunk)
+            for chunk in points()
+        ]
+        bbox = (
+            min(b[0] for b in boxes),
+            min(b[1] for b in boxes),
+            max(b[2] for b in boxes),
+            max(b[3] for b in boxes),
+        )
+    else:
+        if not hasattr(points, "__len__"):
+            points = list(points)
+        bbox = bounding_box(rotate.apply(points) if rotation else points)
+
+    fit = fit_transform(bbox, draw_engine.bounds) @ rotate
+    chunks = points() if callable(points) else chunked(points, STREAM_CHUNK)
+
+    if simplify is not None:
+        from simplify import simplify as simplify_polyline
+
+        fitted = [p for chunk in chunks for p in to_tuples(fit.apply(chunk))]
+        if closed:
+            fitted.append(fitted[0])
+        s_points = simplify_polyline(fitted, tolerance, simplify)
+        print(
+            "Simplification: %d of %d points removed"
+            % (len(fitted) - len(s_points), len(fitted)),
+            file=sys.stderr,
+        )
+        draw_engine.draw_polyline(s_points)
+        return
+
+    # Each chunk is drawn as a run starting at the end of the previous one
+    (first, last) = (None, None)
+    for chunk in chunks:
+        fitted = to_tuples(fit.apply(chunk))
+        if first is None:
+            first = fitted[0]
+        else:
+            fitted = [last] + fitted
+        draw_engine.draw_polyline(fitted)
+        last = fitted[-1]
+    if closed:
+        draw_engine.draw_polyline([last, first])
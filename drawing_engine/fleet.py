@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+""" Fleet scheduler: draw a queue of jobs on several Line-us in parallel """
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+from async_engine import AsyncLineUsDrawEngine
+from lineus_transport import LineUsError
+from plot_estimator import PlotEstimator
+import replay
+
+
+class Job:
+    """A drawing job: a Line-us command stream, as written by the
+    gcode engine of any script"""
+
+    def __init__(self, name, lines):
+        self.name = name
+        self.lines = list(lines)
+        self.attempts = 0
+        estimator = PlotEstimator()
+        for line in self.lines:
+            estimator.send_raw_gcode(line)
+        self.estimate = estimator.time
+
+    @classmethod
+    def from_file(cls, filename):
+        """Job read from a G-code file"""
+        return cls(filename, replay.read_gcode(filename))
+
+
+class Robot:
+    """A Line-us of the fleet, with its persistent connection
+    and health information"""
+
+    def __init__(self, host, port=1337, window=8):
+        self.name = "%s:%d" % (host, port)
+        self.host = host
+        self.port = port
+        self.window = window
+        self.engine = None
+        self.healthy = True
+        self.failures = 0  # Consecutive failures
+        self.last_error = None
+        self.jobs_done = 0
+        self.busy_time = 0
+
+    async def connect(self):
+        """Connect if not already connected"""
+        if self.engine is None:
+            engine = AsyncLineUsDrawEngine(self.host, self.port, self.window)
+            await engine.connect()
+            self.engine = engine
+
+    async def disconnect(self):
+        """Drop the connection, ignoring errors"""
+        if self.engine is not None and self.engine.writer is not None:
+            self.engine.writer.close()
+        self.engine = None
+
+
+class Fleet:
+    """Dispatch jobs to robots, shortest estimated job first.
+    A job failing on a robot is put back in the queue, up to
+    max_attempts times. A robot failing max_failures times in a row
+    is not used anymore, and waits backoff * 2^(failures - 1) s
+    before being used again otherwise"""
+
+    def __init__(self, robots, max_attempts=3, max_failures=3, backoff=1.0):
+        self.robots = robots
+        self.max_attempts = max_attempts
+        self.max_failures = max_failures
+        self.backoff = backoff
+        self.queue = asyncio.PriorityQueue()
+        self.counter = itertools.count()
+        self.remaining = 0
+        self.done = []
+        self.failed = []
+
+    def submit(self, job):
+        """Add a job to the queue"""
+        self.queue.put_nowait((job.estimate, next(self.counter), job))
+        self.remaining += 1
+
+    async def run(self):
+        """Draw all the jobs. Returns (jobs done, jobs failed)"""
+        await asyncio.gather(*(self.run_robot(robot) for robot in self.robots))
+        while not self.queue.empty():  # No healthy robot left
+            self.failed.append(self.queue.get_nowait()[2])
+        return self.done, self.failed
+
+    async def run_robot(self, robot):
+        """Feed a robot with jobs until there is none left"""
+        while self.remaining and robot.healthy:
+            try:
+                (_, _, job) = await asyncio.wait_for(self.queue.get(), 0.5)
+            except asyncio.TimeoutError:
+                continue  # A failing job might be put back in the queue
+            job.attempts += 1
+            start = time.perf_counter()
+            try:
+                await robot.connect()
+                await robot.engine.send_lines(job.lines)
+                await robot.engine.flush()
+            except (OSError, asyncio.IncompleteReadError, LineUsError) as err:
+                await self.job_failed(robot, job, err)
+                continue
+            finally:
+                robot.busy_time += time.perf_counter() - start
+            robot.failures = 0
+            robot.jobs_done += 1
+            self.done.append((job, robot))
+            self.remaining -= 1
+            print("%s: %s done" % (robot.name, job.name), file=sys.stderr)
+        await robot.disconnect()
+
+    async def job_failed(self, robot, job, err):
+        """Requeue the job, and update the robot health"""
+        print("%s: %s failed (%s)" % (robot.name, job.name, err), file=sys.stderr)
+        await robot.disconnect()
+        robot.last_error = err
+        robot.failures += 1
+        if job.attempts < self.max_attempts:
+            self.queue.put_nowait((job.estimate, next(self.counter), job))
+        else:
+            self.failed.append(job)
+            self.remaining -= 1
+        if robot.failures >= self.max_failures:
+            robot.healthy = False
+            if not any(r.healthy for r in self.robots):
+                self.remaining = 0
+        else:
+            await asyncio.sleep(self.backoff * 2 ** (robot.failures - 1))
+
+
+def parse_robot(spec):
+    """Parse a host[:port] robot specification"""
+    (host, _, port) = spec.partition(":")
+    return (host, int(port) if port else 1337)
+
+
+def parse_args():
+    """Basic argument parser"""
+    parser = argparse.ArgumentParser(
+        description="Draw G-code files (see the gcode engine) on several Line-us"
+    )
+    parser.add_argument(
+        "-r",
+        "--robot",
+        help="Line-us host[:port]. Can be repeated",
+        action="append",
+        required=True,
+        type=parse_robot,
+    )
+    parser.add_argument(
+        "--window",
+        help="Number of commands sent before waiting for an answer",
+        default=8,
+        type=int,
+    )
+    parser.add_argument(
+        "--attempts", help="Maximum attempts per job", default=3, type=int
+    )
+    parser.add_argument("jobs", help="G-code files", nargs="+", type=str)
+    _args = parser.parse_args()
+    return _args
+
+
+async def main(args):
+    """Run the jobs"""
+    fleet = Fleet(
+        [Robot(host, port, args.window) for (host, port) in args.robot],
+        max_attempts=args.attempts,
+    )
+    for filename in args.jobs:
+        fleet.submit(Job.from_file(filename))
+    start = time.perf_counter()
+    (done, failed) = await fleet.run()
+    print(
+        "%d jobs done, %d failed in %.1fs"
+        % (len(done), len(failed), time.perf_counter() - start)
+    )
+    for robot in fleet.robots:
+        print(
+            "%s: %d jobs, busy %.1fs, %s"
+            % (
+                robot.name,
+                robot.jobs_done,
+                robot.busy_time,
+                "healthy" if robot.healthy else "failed (%s)" % robot.last_error,
+            )
+        )
+    for job in failed:
+        print("Failed: %s" % job.name)
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main(parse_args())) else 1)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+""" Local Line-us simulator: a TCP server speaking the Line-us G-code
+protocol, with configurable latency, motion model and fault injection """
+import argparse
+from math import hypot
+import queue
+import random
+import signal
+import socketserver
+import sys
+import threading
+import time
+import drawing_engine
+
+HOME = (1000, 1000, 1000)
+
+
+class SimulatedLineUs:
+    """State of the simulated robot, shared by all connections.
+    latency is the network round trip time of a command, in seconds.
+    Moves take overhead + distance / xy_speed seconds (xy_speed in Line-us
+    units per second, 0 for instant moves), Z moves take z_time seconds.
+    error_rate is the probability of answering a command with an error.
+    drop_after closes the connection after that many commands"""
+
+    def __init__(
+        self,
+        latency=0.0,
+        xy_speed=0,
+        z_time=0.0,
+        overhead=0.0,
+        error_rate=0.0,
+        drop_after=None,
+        pen_z=None,
+        seed=None,
+    ):
+        self.latency = latency
+        self.xy_speed = xy_speed
+        self.z_time = z_time
+        self.overhead = overhead
+        self.error_rate = error_rate
+        self.drop_after = drop_after
+        if pen_z is None:
+            pen_z = (
+                drawing_engine.LineUsDrawEngine.LINEUS_HIGH_Z
+                + drawing_engine.LineUsDrawEngine.LINEUS_LOW_Z
+            ) / 2
+        self.pen_z = pen_z
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pos = HOME
+        self.segments = []  # Pen down segments
+        self.slots = {}
+        self.recording = None
+        self.n_commands = 0
+
+    def execute(self, line):
+        """Execute a command. Returns (response, duration)"""
+        with self.lock:
+            self.n_commands += 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                return "error Simulated fault", 0
+            fields = line.split()
+            if not fields:
+                return "error Empty command", 0
+            gcode = fields[0].upper()
+            params = {f[0].upper(): f[1:] for f in fields[1:]}
+            if self.recording is not None and gcode != "M29":
+                self.slots[self.recording].append(line)
+                return "ok", 0
+            if gcode in ("G01", "G00"):
+                try:
+                    return self.g01(params)
+                except ValueError:
+                    return "error Invalid parameter", 0
+            if gcode == "G28":
+                return self.g01({"X": HOME[0], "Y": HOME[1], "Z": HOME[2]})
+            if gcode == "M28":
+                slot = params.get("S", "")
+                if not slot.isdigit() or not 1 <= int(slot) <= 32:
+                    return "error Invalid slot", 0
+                self.recording = int(slot)
+                self.slots[self.recording] = []
+                return "ok", 0
+            if gcode == "M29":
+                self.recording = None
+                return "ok", 0
+            if gcode == "M114":
+                return self.position_response(), 0
+            return "error Unknown command " + gcode, 0
+
+    def g01(self, params):
+        """Interpolated move"""
+        (x, y, z) = self.pos
+        n_x = float(params.get("X", x))
+        n_y = float(params.get("Y", y))
+        n_z = float(params.get("Z", z))
+        duration = self.overhead
+        if (n_x, n_y) != (x, y):
+            if z < self.pen_z:
+                self.segments.append((x, y, n_x, n_y))
+            if self.xy_speed:
+                duration += hypot(n_x - x, n_y - y) / self.xy_speed
+        if n_z != z:
+            duration += self.z_time
+        self.pos = (n_x, n_y, n_z)
+        return self.position_response(), duration
+
+    def position_response(self):
+        """Line-us style position report"""
+        return "ok X:%.2f Y:%.2f Z:%.2f" % self.pos
+
+    def save(self, filename, size=512):
+        """Save the pen down path as an image"""
+        from PIL import Image, ImageDraw
+
+        canvas = (0, size, size, 0)
+        fit_func = drawing_engine.fit_func_factory(
+            drawing_engine.LineUsDrawEngine.LINEUS_CANVAS, canvas
+        )
+        im = Image.new("RGB", (size, size), (255, 255, 255))
+        draw = ImageDraw.Draw(im)
+        with self.lock:
+            for seg in self.segments:
+                draw.line(fit_func(seg[0:2]) + fit_func(seg[2:4]), fill=(0, 0, 0))
+        im.save(filename)
+
+
+class LineUsHandler(socketserver.BaseRequestHandler):
+    """One client connection. Commands are read as soon as they arrive
+    and executed in order. Each response is sent once the network
+    latency and the command duration have elapsed, so that several
+    commands can be in flight as with a real robot"""
+
+    def handle(self):
+        robot = self.server.robot
+        replies = queue.Queue()
+        sender = threading.Thread(target=self.send_replies, args=(replies,))
+        sender.start()
+        replies.put((time.perf_counter() + robot.latency / 2, "hello " + self.hello()))
+        busy_until = 0
+        n_commands = 0
+        rx = b""
+        try:
+            while True:
+                data = self.request.recv(4096)
+                if not data:
+                    break
+                rx += data
+                while b"\x00" in rx:
+                    (line, rx) = rx.split(b"\x00", 1)
+                    n_commands += 1
+                    if robot.drop_after is not None and n_commands > robot.drop_after:
+                        return
+                    arrival = time.perf_counter() + robot.latency / 2
+                    (response, duration) = robot.execute(line.decode("utf-8").strip())
+                    busy_until = max(arrival, busy_until) + duration
+                    replies.put((busy_until + robot.latency / 2, response))
+        except OSError:
+            pass
+        finally:
+            replies.put(None)
+            sender.join()
+
+    def send_replies(self, replies):
+        """Send responses when they are due"""
+        while True:
+            item = replies.get()
+            if item is None:
+                return
+            (due, response) = item
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.request.sendall(response.encode() + b"\x00")
+            except OSError:
+                return
+
+    @staticmethod
+    def hello():
+        """Hello message fields"""
+        return 'VERSION:"simulator" NAME:line-us-sim SERIAL:0'
+
+
+class LineUsSimulator(socketserver.ThreadingTCPServer):
+    """Simulator server. Use port 0 to pick a free port"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=1337, robot=None):
+        self.robot = SimulatedLineUs() if robot is None else robot
+        super().__init__((host, port), LineUsHandler)
+
+    def start(self):
+        """Serve from a background thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def parse_args():
+    """Basic argument parser"""
+    parser = argparse.ArgumentParser(description="Line-us simulator")
+    parser.add_argument("--host", help="Address to listen on", default="127.0.0.1")
+    parser.add_argument("--port", help="Port to listen on", default=1337, type=int)
+    parser.add_argument(
+        "--latency", help="Network round trip time, in s", default=0.0, type=float
+    )
+    parser.add_argument(
+        "--xy-speed",
+        help="Head speed in Line-us units per second (0 for instant moves)",
+        default=0,
+        type=float,
+    )
+    parser.add_argument(
+        "--z-time", help="Duration of a Z move, in s", default=0.0, type=float
+    )
+    parser.add_argument(
+        "--overhead", help="Fixed duration of a move, in s", default=0.0, type=float
+    )
+    parser.add_argument(
+        "--error-rate",
+        help="Probability of answering a command with an error",
+        default=0.0,
+        type=float,
+    )
+    parser.add_argument(
+        "--drop-after",
+        help="Close each connection after that many commands",
+        default=None,
+        type=int,
+    )
+    parser.add_argument("--seed", help="Fault injection random seed", type=int)
+    parser.add_argument(
+        "-o", "--output", help="Save the traced path in this image file on exit"
+    )
+    parser.add_argument(
+        "-s", help="size of the output image side, in pixels", default=512, type=int
+    )
+    _args = parser.parse_args()
+    return _args
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    ROBOT = SimulatedLineUs(
+        latency=ARGS.latency,
+        xy_speed=ARGS.xy_speed,
+        z_time=ARGS.z_time,
+        overhead=ARGS.overhead,
+        error_rate=ARGS.error_rate,
+        drop_after=ARGS.drop_after,
+        seed=ARGS.seed,
+    )
+    SERVER = LineUsSimulator(ARGS.host, ARGS.port, ROBOT)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(
+        "Line-us simulator listening on %s:%d" % SERVER.server_address,
+        file=sys.stderr,
+    )
+    try:
+        SERVER.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        SERVER.server_close()
+        print("%d commands received" % ROBOT.n_commands, file=sys.stderr)
+        if ARGS.output:
+            ROBOT.save(ARGS.output, ARGS.s)
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+""" Line-us TCP transport, able to keep several commands in flight """
+from collections import deque
+import os
+import socket
+import sys
+import time
+
+
+def g01_command(x=None, y=None, z=None):
+    """Format a G01 (interpolated move) command"""
+    cmd = "G01"
+    for axis, val in (("X", x), ("Y", y), ("Z", z)):
+        if val is not None:
+            cmd += " " + axis + str(val)
+    return cmd
+
+
+def discover(wait=2):
+    """Search Line-us on the network (Bonjour) with the lineus library.
+    Returns the (address, port) of the first one found within wait seconds"""
+    from lineus import LineUs
+
+    finder = LineUs()
+    try:
+        deadline = time.monotonic() + wait
+        while True:
+            found = finder.listener.get_first_line_us()
+            if found is not None:
+                return (found[2], found[3])
+            if time.monotonic() > deadline:
+                raise ConnectionError("No Line-us found on the network")
+            time.sleep(0.1)
+    finally:
+        finder.zeroconf.close()
+
+
+class LineUsError(Exception):
+    """Line-us answered a command with an error"""
+
+    def __init__(self, command, response, in_flight=()):
+        super().__init__("%s: %s" % (command, response))
+        self.command = command
+        self.response = response
+        # Commands sent after the failing one, before the error was known
+        self.in_flight = list(in_flight)
+
+
+class GCodeTransport:
+    """Transport base class, with the G-code methods of the lineus
+    library client used by LineUsDrawEngine. They all go through
+    send, which subclasses implement"""
+
+    def connect(self):
+        """Nothing to connect to"""
+        return True
+
+    def g01(self, x=None, y=None, z=None):
+        """Send a G01 (interpolated move)"""
+        if x is None and y is None and z is None:
+            return False
+        return self.send(g01_command(x, y, z))
+
+    def send_gcode(self, gcode, parameters=""):
+        """Send a G-code with its parameters"""
+        return self.send(gcode + " " + parameters if parameters else gcode)
+
+    def send_raw_gcode(self, gcode):
+        """Send a raw G-code line"""
+        return self.send(gcode)
+
+    def send(self, cmd):
+        """Send a command line"""
+        raise NotImplementedError
+
+
+class LineUsClient(GCodeTransport):
+    """Line-us client speaking the TCP G-code protocol: commands and
+    responses are null terminated, and the robot sends a hello
+    message on connection.
+    Up to window commands are sent before waiting for their
+    acknowledgement. Line-us answers commands in order, so
+    acknowledgements are matched to commands first in first out.
+    With window=1, each command waits for its response, as the
+    lineus library does"""
+
+    DEFAULT_PORT = 1337
+
+    def __init__(self, host="line-us.local", port=DEFAULT_PORT, window=1, timeout=5):
+        if not isinstance(window, int) or window < 1:
+            raise ValueError("window must be a positive integer")
+        self.host = host
+        self.port = port
+        self.window = window
+        self.timeout = timeout
+        self.sock = None
+        self.hello = None
+        self.in_flight = deque()
+        self.acked = 0
+        self.last_response = None
+        self.on_ack = None  # Called with (command, response) on success
+        self._rx = b""
+
+    def connect(self):
+        """Connect and read the hello message. Returns True on success"""
+        try:
+            self.sock = socket.create_connection((self.host, self.port), self.timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.hello = self._read_response()
+        except OSError:
+            self.disconnect()
+            return False
+        return True
+
+    def connected(self):
+        """Returns True if connected"""
+        return self.sock is not None
+
+    def disconnect(self):
+        """Close the connection. Commands in flight are forgotten"""
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        self.in_flight.clear()
+        self._rx = b""
+
+    def send(self, cmd):
+        """Send a command, waiting for acknowledgements first if the
+        window is full. Returns the response when window is 1, None
+        otherwise as the response has not been received yet"""
+        if self.sock is None:
+            raise ConnectionError("Not connected to Line-us")
+        while len(self.in_flight) >= self.window:
+            self._wait_ack()
+        self.sock.sendall(cmd.encode() + b"\x00")
+        self.in_flight.append(cmd)
+        if self.window == 1:
+            return self._wait_ack()
+        return None
+
+    def flush(self):
+        """Wait until all commands in flight have been acknowledged"""
+        while self.in_flight:
+            self._wait_ack()
+        return self.last_response
+
+    def _wait_ack(self):
+        """Read the response to the oldest command in flight.
+        On error, the remaining in-flight responses are drained so that
+        the connection can still be used, then LineUsError is raised"""
+        response = self._read_response()
+        cmd = self.in_flight.popleft()
+        if response.startswith("error"):
+            in_flight = list(self.in_flight)
+            while self.in_flight:
+                self._read_response()
+                self.in_flight.popleft()
+            raise LineUsError(cmd, response, in_flight)
+        self.acked += 1
+        self.last_response = response
+        if self.on_ack is not None:
+            self.on_ack(cmd, response)
+        return response
+
+    def _read_response(self):
+        """Read a null terminated response"""
+        while b"\x00" not in self._rx:
+            data = self.sock.recv(4096)
+            if not data:
+                raise ConnectionError("Connection closed by Line-us")
+            self._rx += data
+        (line, self._rx) = self._rx.split(b"\x00", 1)
+        return line.decode("utf-8").rstrip("\r\n")
+
+
+class ResumableLineUs(GCodeTransport):
+    """Transport wrapping a LineUsClient, reconnecting automatically when
+    the connection is lost. It has the same interface as LineUsClient.
+    After reconnecting, the pen is raised, moved back to the last
+    confirmed position and lowered again if needed, then the commands
+    that were not acknowledged are sent again.
+    If journal is set, the number of acknowledged commands and the last
+    confirmed position are saved in this file, every journal_every
+    acknowledgements or journal_interval seconds and when the connection
+    is lost. With resume, the commands already acknowledged according
+    to the journal are skipped, so an interrupted job can be run again
+    from the start and continue where it stopped (or up to journal_every
+    commands before). The journal is removed once flush() succeeds,
+    the job being complete"""
+
+    def __init__(
+        self,
+        client,
+        journal=None,
+        resume=False,
+        high_z=1000,
+        retries=5,
+        backoff=1.0,
+        max_backoff=30.0,
+        journal_every=100,
+        journal_interval=1.0,
+    ):
+        self.client = client
+        self.journal = journal
+        self.high_z = high_z
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.journal_every = journal_every
+        self.journal_interval = journal_interval
+        self.journaled = (0, time.monotonic())  # Acknowledged commands, time
+        self.pending = deque()  # Sent, not acknowledged yet
+        self.state = [None, None, None]  # Last confirmed x, y, z
+        self.acked = 0
+        self.issued = 0
+        self.skip = 0
+        if resume and journal is not None and os.path.exists(journal):
+            with open(journal, encoding="utf-8") as f:
+                fields = f.read().split()
+            self.skip = int(fields[0])
+        client.on_ack = self._acked
+
+    def connect(self):
+        """Connect to Line-us"""
+        return self.client.connect()
+
+    def disconnect(self):
+        """Disconnect from Line-us"""
+        self.client.disconnect()
+
+    def send(self, cmd):
+        """Send a command, skipping it if it was acknowledged in a
+        previous run"""
+        self.issued += 1
+        if self.issued <= self.skip:
+            self._track(cmd)
+            self.acked += 1
+            return "ok"
+        if self.skip and self.issued == self.skip + 1:
+            self._restore()
+        self.pending.append(cmd)
+        try:
+            return self.client.send(cmd)
+        except OSError as err:
+            # cmd is sent again with the other pending commands
+            self._reconnect(err)
+        return None
+
+    def flush(self):
+        """Wait until all commands in flight have been acknowledged,
+        then remove the journal"""
+        while True:
+            try:
+                response = self.client.flush()
+                break
+            except OSError as err:
+                self._reconnect(err)
+        if self.journal is not None and os.path.exists(self.journal):
+            os.remove(self.journal)
+        return response
+
+    def _reconnect(self, err):
+        """Reconnect with exponential backoff, then go back to the last
+        confirmed position and send again the commands in flight"""
+        self._write_journal()
+        delay = self.backoff
+        for _ in range(self.retries):
+            print(
+                "Line-us connection lost (%s), reconnecting in %.1fs" % (err, delay),
+                file=sys.stderr,
+            )
+            self.client.disconnect()
+            time.sleep(delay)
+            delay = min(2 * delay, self.max_backoff)
+            try:
+                if self.client.connect():
+                    self._restore()
+                    for cmd in list(self.pending):
+                        self.client.send(cmd)
+                    return
+            except OSError as retry_err:
+                err = retry_err
+        raise ConnectionError("Can't reconnect to Line-us") from err
+
+    def _restore(self):
+        """Pen up travel to the last confirmed position"""
+        (x, y, z) = self.state
+        self.client.on_ack = None
+        try:
+            self.client.send(g01_command(z=self.high_z))
+            if x is not None:
+                self.client.send(g01_command(x, y))
+            if z is not None and z != self.high_z:
+                self.client.send(g01_command(z=z))
+            self.client.flush()
+        finally:
+            self.client.on_ack = self._acked
+
+    def _track(self, cmd):
+        """Update the confirmed position with a command"""
+        if cmd.startswith("G01"):
+            for i, val in enumerate(parse_g01(cmd)):
+                if val is not None:
+                    self.state[i] = val
+        elif cmd.startswith("G28"):
+            self.state = [1000, 1000, 1000]
+
+    def _acked(self, cmd, _response):
+        """A command was acknowledged: record it in the journal
+        if it was not written for a while"""
+        self.pending.popleft()
+        self.acked += 1
+        self._track(cmd)
+        (acked, when) = self.journaled
+        if (
+            self.acked - acked >= self.journal_every
+            or time.monotonic() - when >= self.journal_interval
+        ):
+            self._write_journal()
+
+    def _write_journal(self):
+        """Save the number of acknowledged commands and the last
+        confirmed position in the journal"""
+        self.journaled = (self.acked, time.monotonic())
+        if self.journal is None:
+            return
+        tmp = self.journal + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("%d %s %s %s\n" % ((self.acked,) + tuple(self.state)))
+        os.replace(tmp, self.journal)
+
+
+class GCodeRecorder(GCodeTransport):
+    """Transport recording commands instead of sending them.
+    It has the same interface as LineUsClient.
+    Commands are kept in lines, or written to stream if set"""
+
+    def __init__(self, stream=None):
+        self.lines = []
+        self.stream = stream
+
+    def send(self, cmd):
+        """Record a command"""
+        if self.stream is None:
+            self.lines.append(cmd)
+        else:
+            self.stream.write(cmd + "\n")
+        return "ok"
+
+
+def parse_g01(line):
+    """Get the (x, y, z) values of a G01 line, None for missing ones"""
+    values = {"X": None, "Y": None, "Z": None}
+    for field in line.split()[1:]:
+        if field[0] in values:
+            values[field[0]] = float(field[1:])
+    return (values["X"], values["Y"], values["Z"])
+
+
+def split_slots(lines, max_size, high_z):
+    """Split a G-code program in chunks of at most max_size bytes.
+    Each chunk after the first one starts by moving the pen up to
+    where the previous chunk ended, then restores the pen height"""
+    chunks, chunk, size = [], [], 0
+    (x, y, z) = (None, None, None)
+    for line in lines:
+        if size + len(line) + 1 > max_size and chunk:
+            chunks.append(chunk)
+            chunk = []
+            if x is not None:
+                chunk += ["G01 Z" + str(high_z), "G01 X%s Y%s" % (x, y)]
+            if z is not None:
+                chunk.append("G01 Z" + str(z))
+            size = sum(len(l) + 1 for l in chunk)
+            if size + len(line) + 1 > max_size:
+                raise ValueError("Slot size too small")
+        chunk.append(line)
+        size += len(line) + 1
+        if line.startswith("G01"):
+            (n_x, n_y, n_z) = parse_g01(line)
+            x = x if n_x is None else n_x
+            y = y if n_y is None else n_y
+            z = z if n_z is None else n_z
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def upload(transport, chunks, first_slot):
+    """Save each chunk of G-code in a Line-us memory slot, starting
+    at first_slot. Returns (size in bytes, upload time in s)"""
+    if first_slot < 1 or first_slot + len(chunks) - 1 > 32:
+        raise ValueError("Not enough memory slots (slots are numbered 1 to 32)")
+    start = time.perf_counter()
+    size = 0
+    for slot, chunk in enumerate(chunks, first_slot):
+        transport.send_gcode("M28", "S" + str(slot))
+        for line in chunk:
+            transport.send_raw_gcode(line)
+            size += len(line) + 1
+        transport.send_gcode("M29")
+    if hasattr(transport, "flush"):
+        transport.flush()
+    return size, time.perf_counter() - start
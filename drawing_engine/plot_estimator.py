@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+""" Line-us plot time estimation from its command stream """
+import argparse
+from math import acos, atan2, cos, hypot, sin
+from lineus_transport import GCodeTransport, parse_g01
+import drawing_engine
+
+
+class PlotEstimator(GCodeTransport):
+    """Transport estimating the time Line-us takes to execute commands,
+    instead of sending them. It has the same interface as LineUsClient.
+    Line-us is modelled as a two links arm rotating around the origin,
+    the arm servos moving at servo_speed rad/s. A Z move takes z_time s,
+    each command has a fixed overhead, and latency is the network
+    round trip time hidden by keeping window commands in flight.
+    Default values are rough estimates of a real Line-us"""
+
+    ARM_LENGTH = 1050  # Both links, in Line-us units
+    SERVO_SPEED = 6.0
+    Z_TIME = 0.15
+    OVERHEAD = 0.01
+    LATENCY = 0.02
+
+    def __init__(
+        self,
+        servo_speed=SERVO_SPEED,
+        z_time=Z_TIME,
+        overhead=OVERHEAD,
+        latency=LATENCY,
+        window=1,
+    ):
+        self.servo_speed = servo_speed
+        self.z_time = z_time
+        self.overhead = overhead
+        self.latency = latency
+        self.window = window
+        self.pos = (1000, 1000, 1000)  # Line-us home position
+        self.pen_z = (
+            drawing_engine.LineUsDrawEngine.LINEUS_HIGH_Z
+            + drawing_engine.LineUsDrawEngine.LINEUS_LOW_Z
+        ) / 2
+        self.time = 0
+        self.n_commands = 0
+        self.n_lifts = 0
+        self.up_dist = 0
+        self.down_dist = 0
+
+    def joint_angles(self, x, y):
+        """Inverse kinematics: get the (shoulder, elbow) angles"""
+        r = min(hypot(x, y), 2 * self.ARM_LENGTH)
+        elbow = acos(max(-1, min(1, r * r / (2 * self.ARM_LENGTH**2) - 1)))
+        shoulder = atan2(y, x) - atan2(sin(elbow), 1 + cos(elbow))
+        return shoulder, elbow
+
+    def send(self, cmd):
+        """Account for a command"""
+        if cmd.startswith("G01"):
+            return self.move(*parse_g01(cmd))
+        if cmd.startswith("G28"):
+            return self.move(1000, 1000, 1000)
+        self.account(self.overhead)
+        return "ok"
+
+    def move(self, x, y, z):
+        """Account for a move, None coordinates being unchanged"""
+        (o_x, o_y, o_z) = self.pos
+        n_x = o_x if x is None else x
+        n_y = o_y if y is None else y
+        n_z = o_z if z is None else z
+        duration = self.overhead
+        dist = hypot(n_x - o_x, n_y - o_y)
+        if dist:
+            (s_0, e_0) = self.joint_angles(o_x, o_y)
+            (s_1, e_1) = self.joint_angles(n_x, n_y)
+            duration += max(abs(s_1 - s_0), abs(e_1 - e_0)) / self.servo_speed
+            if o_z < self.pen_z:
+                self.down_dist += dist
+            else:
+                self.up_dist += dist
+        if n_z != o_z:
+            duration += self.z_time
+            if n_z >= self.pen_z > o_z:
+                self.n_lifts += 1
+        self.pos = (n_x, n_y, n_z)
+        self.account(duration)
+        return "ok"
+
+    def account(self, duration):
+        """Add a command duration, including the part of the network
+        latency not hidden by the other commands in flight"""
+        self.n_commands += 1
+        self.time += max(duration, (duration + self.latency) / self.window)
+
+    def report(self):
+        """Human readable estimation"""
+        (minutes, seconds) = divmod(self.time, 60)
+        return (
+            "Estimated plot time %dm%04.1fs: %d commands, %d pen lifts, "
+            + "pen down distance %.0f, pen up distance %.0f (Line-us units)"
+        ) % (
+            minutes,
+            seconds,
+            self.n_commands,
+            self.n_lifts,
+            self.down_dist,
+            self.up_dist,
+        )
+
+
+def parse_args():
+    """Basic argument parser"""
+    parser = argparse.ArgumentParser(description="Estimate a G-code file plot time")
+    parser.add_argument("file", help="G-code file", type=str)
+    parser.add_argument(
+        "--window",
+        help="Number of commands sent before waiting for an answer",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "--latency",
+        help="Network round trip time, in s",
+        default=PlotEstimator.LATENCY,
+        type=float,
+    )
+    _args = parser.parse_args()
+    return _args
+
+
+if __name__ == "__main__":
+    import replay
+
+    ARGS = parse_args()
+    ESTIMATOR = PlotEstimator(latency=ARGS.latency, window=ARGS.window)
+    for LINE in replay.read_gcode(ARGS.file):
+        ESTIMATOR.send_raw_gcode(LINE)
+    print(ESTIMATOR.report())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Compact point container """
+from array import array
+from itertools import chain
+
+try:
+    import numpy
+except ImportError:  # Pure Python fallback
+    numpy = None
+
+# Below this number of points, transforming in pure Python is faster
+NUMPY_MIN_POINTS = 64
+
+
+class PointBuffer:
+    """Sequence of (x, y) points stored as interleaved doubles, 16 bytes
+    per point, in data: an array('d'), or a memoryview of doubles on
+    another buffer (a numpy array, another PointBuffer).
+    Indexing gives (x, y) tuples. Slices with a unit step are views
+    sharing the memory of the buffer, other slices are copies.
+    Only buffers backed by an array can grow, and not while views
+    on them exist.
+    The buffer is shared, without copy, by slices and by the numpy arrays
+    of to_numpy. Drawing engines are not given buffers: they take (x, y)
+    tuples, each chunk being copied to a list by to_tuples before being
+    drawn.
+    memoryview(points.data) is a flat buffer of doubles on all Python
+    versions. memoryview(points) only works from Python 3.12 (PEP 688)"""
+
+    def __init__(self, points=(), data=None):
+        if data is not None:
+            self.data = data
+        elif hasattr(points, "shape"):  # numpy array: no copy if contiguous
+            contiguous = numpy.ascontiguousarray(points, "d")
+            self.data = memoryview(contiguous).cast("B").cast("d")
+        elif isinstance(points, PointBuffer):
+            self.data = array("d", points.data)
+        else:
+            self.data = array("d", chain.from_iterable(points))
+
+    def __len__(self):
+        return len(self.data) // 2
+
+    def __iter__(self):
+        d_iter = iter(self.data)
+        return zip(d_iter, d_iter)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            (start, stop, step) = index.indices(len(self))
+            if step == 1:
+                view = memoryview(self.data)[2 * start : 2 * max(start, stop)]
+                return PointBuffer(data=view)
+            return PointBuffer(self[i] for i in range(start, stop, step))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PointBuffer index out of range")
+        return (self.data[2 * index], self.data[2 * index + 1])
+
+    def __buffer__(self, flags):
+        # Only called from Python 3.12, earlier versions ignore it
+        return memoryview(self.data)
+
+    def __repr__(self):
+        return "PointBuffer(%r)" % self.tolist()
+
+    def append(self, p):
+        """Add a point at the end"""
+        self.data.extend(p[:2])
+
+    def extend(self, points):
+        """Add points at the end"""
+        self.data.extend(chain.from_iterable(points))
+
+    def tolist(self):
+        """Get the points as a list of (x, y) tuples"""
+        return list(self)
+
+    def to_numpy(self):
+        """Get a (n, 2) numpy array sharing the buffer memory"""
+        return numpy.frombuffer(self.data, "d").reshape(-1, 2)
+
+    def bounds(self):
+        """Get the (x0, y0, x1, y1) bounding box of the points"""
+        if numpy is not None:
+            array_view = self.to_numpy()
+            return (*array_view.min(axis=0).tolist(), *array_view.max(axis=0).tolist())
+        view = memoryview(self.data)
+        (x_s, y_s) = (view[0::2], view[1::2])
+        return (min(x_s), min(y_s), max(x_s), max(y_s))
+
+    def transform(self, transform):
+        """Get the points mapped by a drawing_engine.Transform,
+        in a new PointBuffer"""
+        if numpy is not None and len(self) >= NUMPY_MIN_POINTS:
+            return PointBuffer(transform.apply(self.to_numpy()))
+        (a, b, c, d, e, f) = transform.matrix
+        return PointBuffer(
+            data=array(
+                "d",
+                chain.from_iterable(
+                    (a * x + b * y + c, d * x + e * y + f) for (x, y) in self
+                ),
+            )
+        )
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" Stream a G-code file written by the gcode engine to Line-us """
+import argparse
+import sys
+import time
+from lineus_transport import LineUsClient, split_slots, upload
+import drawing_engine
+
+
+def read_gcode(filename):
+    """Read a G-code file, skipping empty lines and comments"""
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            line = line.split(";", 1)[0].strip()
+            if line:
+                yield line
+
+
+def replay(client, lines):
+    """Send lines to Line-us. Returns (number of commands, time in s)"""
+    start = time.perf_counter()
+    n_lines = 0
+    for line in lines:
+        client.send_raw_gcode(line)
+        n_lines += 1
+    client.flush()
+    return n_lines, time.perf_counter() - start
+
+
+def parse_args():
+    """Basic argument parser"""
+    parser = argparse.ArgumentParser(description="Replay a G-code file on Line-us")
+    parser.add_argument("file", help="G-code file", type=str)
+    parser.add_argument(
+        "--host", help="Line-us host name or address", default="line-us.local"
+    )
+    parser.add_argument("--port", help="Line-us TCP port", default=1337, type=int)
+    parser.add_argument(
+        "--window",
+        help="Number of commands sent before waiting for an answer",
+        default=8,
+        type=int,
+    )
+    parser.add_argument(
+        "--slot",
+        help="Upload the file to Line-us memory, starting at this slot (1-32), "
+        + "instead of drawing it",
+        type=int,
+    )
+    _args = parser.parse_args()
+    return _args
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    CLIENT = LineUsClient(ARGS.host, ARGS.port, ARGS.window)
+    if not CLIENT.connect():
+        print("Can't connect to Line-us", file=sys.stderr)
+        sys.exit(-1)
+    if ARGS.slot is None:
+        (N_LINES, ELAPSED) = replay(CLIENT, read_gcode(ARGS.file))
+        print("%d commands sent in %.2fs" % (N_LINES, ELAPSED), file=sys.stderr)
+    else:
+        CHUNKS = split_slots(
+            read_gcode(ARGS.file),
+            drawing_engine.LineUsDrawEngine.LINEUS_SLOT_SIZE,
+            drawing_engine.LineUsDrawEngine.LINEUS_HIGH_Z,
+        )
+        (SIZE, ELAPSED) = upload(CLIENT, CHUNKS, ARGS.slot)
+        print(
+            "Uploaded %d bytes to slot(s) %d-%d in %.2fs"
+            % (SIZE, ARGS.slot, ARGS.slot + len(CHUNKS) - 1, ELAPSED),
+            file=sys.stderr,
+        )
+    CLIENT.disconnect()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+""" Polyline simplification """
+import heapq
+from math import hypot
+
+METHODS = ("rdp", "visvalingam")
+
+
+def _segment_distance(p, a, b):
+    """Distance from p to the segment [a, b]"""
+    (dx, dy) = (b[0] - a[0], b[1] - a[1])
+    norm = dx * dx + dy * dy
+    if norm == 0:
+        return hypot(p[0] - a[0], p[1] - a[1])
+    t = max(0, min(1, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / norm))
+    return hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+
+def rdp(points, tolerance):
+    """Ramer-Douglas-Peucker: keep the points needed for the simplified
+    polyline to stay within tolerance of the original one"""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        (first, last) = stack.pop()
+        (a, b) = (points[first], points[last])
+        (d_max, i_max) = (0, None)
+        for i in range(first + 1, last):
+            d = _segment_distance(points[i], a, b)
+            if d > d_max:
+                (d_max, i_max) = (d, i)
+        if i_max is not None and d_max > tolerance:
+            keep[i_max] = True
+            stack.append((first, i_max))
+            stack.append((i_max, last))
+    return [p for (p, k) in zip(points, keep) if k]
+
+
+def _area(a, b, c):
+    """Area of the triangle a, b, c"""
+    return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2
+
+
+def visvalingam(points, tolerance):
+    """Visvalingam-Whyatt: repeatedly remove the point forming the
+    smallest triangle with its neighbours, while this area is less
+    than tolerance^2 / 2 (a spike of height tolerance on a base
+    of length tolerance)"""
+    n = len(points)
+    if n < 3:
+        return list(points)
+    threshold = tolerance * tolerance / 2
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    removed = [False] * n
+    areas = [None] * n
+    for i in range(1, n - 1):
+        areas[i] = _area(points[i - 1], points[i], points[i + 1])
+    heap = [(areas[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    while heap:
+        (area, i) = heapq.heappop(heap)
+        if removed[i] or area != areas[i]:
+            continue  # Outdated entry
+        if area >= threshold:
+            break
+        removed[i] = True
+        (p, q) = (prev[i], nxt[i])
+        nxt[p], prev[q] = q, p
+        for j in (p, q):
+            if 0 < j < n - 1:
+                # Never let an area drop below the removed one, so
+                # that points are removed in a consistent order
+                areas[j] = max(area, _area(points[prev[j]], points[j], points[nxt[j]]))
+                heapq.heappush(heap, (areas[j], j))
+    return [p for (p, r) in zip(points, removed) if not r]
+
+
+def simplify(points, tolerance, method="rdp"):
+    """Simplify a polyline with one of METHODS"""
+    if method == "rdp":
+        return rdp(points, tolerance)
+    if method == "visvalingam":
+        return visvalingam(points, tolerance)
+    raise ValueError("Unknown simplification method " + str(method))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+""" Stroke scheduling: reorder and flip polylines to cut pen-up travel """
+from math import floor, hypot, sqrt
+import time
+
+SCHEDULES = ("none", "greedy", "2opt")
+
+
+def strokes_to_polylines(strokes):
+    """Convert a stroke sequence to a list of polylines.
+    A 4-tuple stroke (x0, y0, x1, y1) starts a new polyline, a
+    2-tuple stroke (x, y) continues the current one"""
+    polylines = []
+    for stroke in strokes:
+        if len(stroke) == 4:
+            polylines.append([tuple(stroke[0:2]), tuple(stroke[2:4])])
+        elif polylines:
+            polylines[-1].append(tuple(stroke))
+        else:
+            polylines.append([tuple(stroke)])
+    return polylines
+
+
+def travel_distance(polylines, start=None):
+    """Total pen-up distance needed to draw polylines in sequence.
+    If start is None, the travel to the first polyline is not counted"""
+    dist = 0
+    pos = start
+    for polyline in polylines:
+        if pos is not None:
+            dist += hypot(polyline[0][0] - pos[0], polyline[0][1] - pos[1])
+        pos = polyline[-1]
+    return dist
+
+
+class _EndpointGrid:
+    """Polyline endpoints bucketed in square cells, for nearest endpoint
+    queries looking only at the cells around the current position"""
+
+    def __init__(self, polylines):
+        points = [p for line in polylines for p in (line[0], line[-1])]
+        (x0, y0) = (min(p[0] for p in points), min(p[1] for p in points))
+        (x1, y1) = (max(p[0] for p in points), max(p[1] for p in points))
+        (width, height) = (x1 - x0, y1 - y0)
+        # About one polyline per cell, even for a single line of text
+        n = len(polylines)
+        self.size = max(sqrt(width * height / n), max(width, height) / n) or 1.0
+        self.origin = (x0, y0)
+        self.extent = self.cell((x1, y1))
+        self.cells = {}  # (column, row) -> [(index, reversed, start point)]
+        for (i, line) in enumerate(polylines):
+            for (rev, p) in ((False, line[0]), (True, line[-1])):
+                self.cells.setdefault(self.cell(p), []).append((i, rev, p))
+        self.done = set()
+
+    def cell(self, p):
+        """Get the (column, row) of the cell containing p"""
+        return (
+            floor((p[0] - self.origin[0]) / self.size),
+            floor((p[1] - self.origin[1]) / self.size),
+        )
+
+    def ring(self, center, radius):
+        """Get the grid cells at Chebyshev distance radius from center"""
+        (c_x, c_y) = center
+        columns = range(max(0, c_x - radius), min(self.extent[0], c_x + radius) + 1)
+        rows = range(max(0, c_y - radius), min(self.extent[1], c_y + radius) + 1)
+        for row in rows:
+            if abs(row - c_y) == radius:
+                for column in columns:
+                    yield (column, row)
+            else:
+                for column in (c_x - radius, c_x + radius):
+                    if column in columns:
+                        yield (column, row)
+
+    def nearest(self, pos):
+        """Get the (index, reversed) of the nearest polyline end to pos,
+        among the polylines not done yet"""
+        center = self.cell(pos)
+        max_radius = max(
+            center[0], self.extent[0] - center[0], center[1], self.extent[1] - center[1]
+        )
+        (best, best_d) = (None, None)
+        for radius in range(max_radius + 1):
+            for cell in self.ring(center, radius):
+                entries = self.cells.get(cell)
+                if not entries:
+                    continue
+                entries[:] = [e for e in entries if e[0] not in self.done]
+                for (i, rev, p) in entries:
+                    d = hypot(p[0] - pos[0], p[1] - pos[1])
+                    if best_d is None or d < best_d:
+                        (best, best_d) = ((i, rev), d)
+            # Cells further away are at least radius cells from pos
+            if best_d is not None and best_d <= radius * self.size:
+                break
+        return best
+
+
+def _greedy(polylines, start, deadline):
+    """Nearest neighbour ordering. Each polyline can be drawn
+    in both directions. When deadline is reached, the remaining
+    polylines are appended in declared order.
+    Returns a list of (index, reversed) tuples"""
+    grid = _EndpointGrid(polylines)
+    tour = []
+    if start is None:
+        tour.append((0, False))
+        grid.done.add(0)
+        pos = polylines[0][-1]
+    else:
+        pos = start
+    while len(tour) < len(polylines):
+        if deadline is not None and time.perf_counter() > deadline:
+            tour.extend(
+                (i, False) for i in range(len(polylines)) if i not in grid.done
+            )
+            break
+        best = grid.nearest(pos)
+        tour.append(best)
+        grid.done.add(best[0])
+        pos = polylines[best[0]][0 if best[1] else -1]
+    return tour
+
+
+def _tour_polylines(polylines, tour):
+    """Polylines in the order and directions of a list of
+    (index, reversed) tuples"""
+    return [polylines[i][::-1] if rev else polylines[i] for (i, rev) in tour]
+
+
+def _two_opt(polylines, tour, start, deadline):
+    """Improve a tour with 2-opt moves. Reversing a section of the tour
+    also reverses the drawing direction of each polyline in it.
+    Stop when no move improves the tour or when deadline is reached"""
+
+    def ends(entry):
+        line = polylines[entry[0]]
+        return (line[-1], line[0]) if entry[1] else (line[0], line[-1])
+
+    def dist(p, q):
+        if p is None or q is None:
+            return 0
+        return hypot(p[0] - q[0], p[1] - q[1])
+
+    n = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n):
+            if deadline is not None and time.perf_counter() > deadline:
+                return tour
+            prev_end = start if i == 0 else ends(tour[i - 1])[1]
+            (s_i, _) = ends(tour[i])
+            for j in range(i, n):  # j == i flips a single polyline
+                (_, e_j) = ends(tour[j])
+                next_start = ends(tour[j + 1])[0] if j + 1 < n else None
+                delta = (
+                    dist(prev_end, e_j)
+                    + dist(s_i, next_start)
+                    - dist(prev_end, s_i)
+                    - dist(e_j, next_start)
+                )
+                if delta < -1e-9:
+                    tour[i : j + 1] = [
+                        (k, not rev) for (k, rev) in reversed(tour[i : j + 1])
+                    ]
+                    (s_i, _) = ends(tour[i])
+                    improved = True
+    return tour
+
+
+def schedule(polylines, start=None, method="2opt", time_limit=1.0):
+    """Reorder and flip polylines to reduce the pen-up travel.
+    method is one of SCHEDULES: "none" keeps the declared order,
+    "greedy" uses nearest neighbour, "2opt" refines the better of the
+    greedy and declared orders until no improvement is found. Both
+    stop when time_limit seconds (None for no limit) have elapsed
+    since the call.
+    Returns (polylines, travel_before, travel_after)"""
+    if method not in SCHEDULES:
+        raise ValueError("Unknown schedule method " + str(method))
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    before = travel_distance(polylines, start)
+    if method == "none" or len(polylines) < 2:
+        return polylines, before, before
+
+    tour = _greedy(polylines, start, deadline)
+    # Greedy might be worse than a well thought declared order:
+    # 2-opt refines the better of both
+    if travel_distance(_tour_polylines(polylines, tour), start) > before:
+        tour = [(i, False) for i in range(len(polylines))]
+    if method == "2opt":
+        tour = _two_opt(polylines, tour, start, deadline)
+    scheduled = _tour_polylines(polylines, tour)
+    after = travel_distance(scheduled, start)
+    if after > before:
+        return polylines, before, before
+    return scheduled, before, after
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+""" Tiled raster drawing engine, rendering tiles in parallel """
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, floor
+import os
+import struct
+import sys
+import zlib
+from drawing_engine import DrawEngine, Transform
+from point_buffer import PointBuffer
+
+
+def render_tile(job):
+    """Rasterize the polylines of a tile, in a worker process. job is
+    (mode, tile origin, tile size, points, starts, output), see
+    TiledPilDrawEngine. The tile is saved to output if set, returned
+    otherwise"""
+    from PIL import Image, ImageDraw
+
+    (mode, origin, size, points, starts, output) = job
+    image = Image.new(mode, size, "white")
+    draw = ImageDraw.Draw(image)
+    # PIL truncates coordinates: flooring them before the integer shift
+    # gives the same pixels as when drawing on a single image, even for
+    # points left or above the tile
+    shift = Transform().translate(-origin[0], -origin[1])
+    ends = list(starts[1:]) + [len(points)]
+    for (start, end) in zip(starts, ends):
+        polyline = shift.apply(points[start:end])
+        draw.line(
+            [(floor(x), floor(y)) for (x, y) in polyline], fill="black", joint="curve"
+        )
+    if output is None:
+        return image
+    image.save(output)
+    return None
+
+
+def bounded_map(executor, func, items, window):
+    """executor.map, submitting at most window items ahead of
+    the result being read"""
+    futures = deque()
+    for item in items:
+        futures.append(executor.submit(func, item))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+class TiledPilDrawEngine(DrawEngine):
+    """PIL drawing engine splitting the canvas in tiles of tile_size
+    pixels. Each segment is added to the tiles its bounding box
+    overlaps, consecutive segments of a tile being merged in polylines.
+    The polylines of a tile are stored in a single PointBuffer, with
+    the index of the first point of each polyline.
+    On show(), tiles are rasterized in jobs worker processes (default:
+    number of cores), then stitched in one image, shown in a viewer or
+    saved to output. When output contains %d twice, e.g. tile_%d_%d.png,
+    each tile is saved by its worker to output % (row, column) instead.
+    mode is the PIL image mode, "1" (1 bit per pixel) using the least
+    memory"""
+
+    def __init__(self, bounds, output=None, tile_size=2048, mode="RGB", jobs=None):
+        (x0, y0, x1, y1) = bounds
+        self.bounds = bounds
+        self.output = output
+        self.tile_size = tile_size
+        self.mode = mode
+        self.jobs = jobs
+        self.size = (abs(x1 - x0), abs(y1 - y0))
+        (self.left, self.top) = (min(x0, x1), min(y0, y1))
+        self.columns = ceil(self.size[0] / tile_size)
+        self.rows = ceil(self.size[1] / tile_size)
+        self.tiles = {}  # (row, column) -> (points, polyline starts)
+        self.open = set()  # Tiles with a polyline ending at the current position
+        self.pos = (x0, y0)
+
+    def tile_range(self, a, b, origin, count):
+        """Range of the tiles overlapped by [a, b] on an axis"""
+        (t_a, t_b) = sorted(
+            (int((a - origin) // self.tile_size), int((b - origin) // self.tile_size))
+        )
+        return range(max(0, t_a), min(count - 1, t_b) + 1)
+
+    def add_segment(self, p0, p1):
+        """Add a segment to the tiles it overlaps"""
+        opened = set()
+        for row in self.tile_range(p0[1], p1[1], self.top, self.rows):
+            for column in self.tile_range(p0[0], p1[0], self.left, self.columns):
+                tile = self.tiles.get((row, column))
+                if tile is None:
+                    tile = self.tiles[(row, column)] = (PointBuffer(), array("q"))
+                (points, starts) = tile
+                if (row, column) not in self.open:
+                    starts.append(len(points))
+                    points.append(p0)
+                points.append(p1)
+                opened.add((row, column))
+        self.open = opened
+
+    def set_pos(self, p):
+        """Set current position"""
+        if tuple(p) != tuple(self.pos):
+            self.open = set()
+        self.pos = p
+
+    def draw_line(self, p0, p1=None):
+        """Draw a line between p0 and p1 or between the current position and p0"""
+        if p1 is not None:
+            self.set_pos(p0)
+            p0 = p1
+        self.add_segment(self.pos, p0)
+        self.pos = p0
+
+    def draw_polyline(self, points):
+        """Draw a polyline"""
+        self.set_pos(points[0])
+        pos = self.pos
+        for p in points[1:]:
+            self.add_segment(pos, p)
+            pos = p
+        self.pos = pos
+
+    def show(self):
+        """Rasterize the tiles, then show, save or write them"""
+        from PIL import Image
+
+        tiled_output = self.output is not None and self.output.count("%") == 2
+        jobs = []
+        for row in range(self.rows):
+            for column in range(self.columns):
+                if (row, column) not in self.tiles and not tiled_output:
+                    continue  # Left blank
+                origin = (
+                    self.left + column * self.tile_size,
+                    self.top + row * self.tile_size,
+                )
+                size = (
+                    min(self.tile_size, self.size[0] - column * self.tile_size),
+                    min(self.tile_size, self.size[1] - row * self.tile_size),
+                )
+                (points, starts) = self.tiles.pop(
+                    (row, column), (PointBuffer(), array("q"))
+                )
+                jobs.append(
+                    (
+                        self.mode,
+                        origin,
+                        size,
+                        points,
+                        starts,
+                        self.output % (row, column) if tiled_output else None,
+                    )
+                )
+        self.open = set()
+        png_output = self.output is not None and self.output.lower().endswith(".png")
+        with ProcessPoolExecutor(self.jobs) as executor:
+            # Only a few tiles ahead are rendered, not to keep them all in memory
+            tiles = bounded_map(
+                executor, render_tile, jobs, 2 * (self.jobs or os.cpu_count())
+            )
+            if tiled_output:
+                list(tiles)
+            elif png_output:
+                self.write_png(zip(jobs, tiles))
+            else:
+                image = Image.new(self.mode, self.size, "white")
+                for (job, tile) in zip(jobs, tiles):
+                    (x, y) = job[1]
+                    image.paste(tile, (int(x - self.left), int(y - self.top)))
+        print(
+            "%d of %dx%d tiles rendered" % (len(jobs), self.rows, self.columns),
+            file=sys.stderr,
+        )
+        if tiled_output or png_output:
+            return
+        if self.output is None:
+            image.show()
+        else:
+            image.save(self.output)
+
+    def write_png(self, rendered):
+        """Stitch the (job, tile) rendered tiles one row of tiles at a
+        time, written to the PNG output file as they come, so that the
+        whole image is never in memory"""
+        from PIL import Image
+
+        pending = next(rendered, None)
+        with open(self.output, "wb") as f:
+            writer = PngWriter(f, self.size, self.mode)
+            for row in range(self.rows):
+                band_top = self.top + row * self.tile_size
+                height = min(self.tile_size, self.size[1] - row * self.tile_size)
+                band = Image.new(self.mode, (self.size[0], height), "white")
+                while pending is not None and pending[0][1][1] == band_top:
+                    (job, tile) = pending
+                    band.paste(tile, (int(job[1][0] - self.left), 0))
+                    pending = next(rendered, None)
+                writer.write_rows(band)
+            writer.close()
+
+
+class PngWriter:
+    """Minimal streaming PNG writer: rows are compressed and written as
+    they are given. Supports the "1", "L" and "RGB" PIL modes"""
+
+    FORMATS = {"1": (1, 0), "L": (8, 0), "RGB": (8, 2)}  # Bit depth, color type
+
+    def __init__(self, file, size, mode):
+        self.file = file
+        self.compressor = zlib.compressobj()
+        (depth, color) = self.FORMATS[mode]
+        file.write(b"\x89PNG\r\n\x1a\n")
+        self.chunk(
+            b"IHDR", struct.pack(">IIBBBBB", size[0], size[1], depth, color, 0, 0, 0)
+        )
+
+    def chunk(self, kind, data):
+        """Write a PNG chunk"""
+        self.file.write(struct.pack(">I", len(data)) + kind + data)
+        self.file.write(struct.pack(">I", zlib.crc32(kind + data)))
+
+    def write_rows(self, image):
+        """Append the rows of a PIL image, as wide as the PNG one"""
+        data = image.tobytes()
+        stride = len(data) // image.height
+        compressed = self.compressor.compress(
+            b"".join(
+                b"\x00" + data[i : i + stride] for i in range(0, len(data), stride)
+            )
+        )
+        if compressed:
+            self.chunk(b"IDAT", compressed)
+
+    def close(self):
+        """Write the end of the PNG file"""
+        self.chunk(b"IDAT", self.compressor.flush())
+        self.chunk(b"IEND", b"")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+""" Vector drawing engines, streaming paths to SVG or PDF files """
+import sys
+from drawing_engine import DrawEngine
+
+
+class VectorDrawEngine(DrawEngine):
+    """Base class of the engines writing each pen-down run as a single
+    path to a file, as soon as it is drawn. Memory use does not depend
+    on the number of points. Coordinates are written with precision
+    decimals. bounds is the canvas bounding box: (x0, y0, x1, y1) format,
+    y increasing downward as with PIL"""
+
+    def __init__(self, bounds, output, precision=2):
+        self.bounds = bounds
+        self.output = output
+        self.precision = precision
+        (x0, y0, x1, y1) = bounds
+        (self.width, self.height) = (abs(x1 - x0), abs(y1 - y0))
+        (self.left, self.top) = (min(x0, x1), min(y0, y1))
+        self.pos = (bounds[0], bounds[1])
+        self.in_run = False
+        self.n_runs = 0
+        self.n_points = 0
+        self.file = open(output, "wb")
+        self.write_header()
+
+    def fmt(self, value):
+        """Format a coordinate, without useless trailing zeros"""
+        text = "%.*f" % (self.precision, value)
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+        return "0" if text == "-0" else text
+
+    def set_pos(self, p):
+        """Set current position. The current run goes on if p
+        is the current position"""
+        if self.in_run and tuple(p) != tuple(self.pos):
+            self.write_run_end()
+            self.in_run = False
+        self.pos = p
+
+    def draw_line(self, p0, p1=None):
+        """Draw a line between p0 and p1 or between the current position and p0"""
+        if p1 is not None:
+            self.set_pos(p0)
+            p0 = p1
+        self.extend_run((p0,))
+
+    def draw_polyline(self, points):
+        """Draw a polyline, continuing the current run if it starts
+        at the current position"""
+        self.set_pos(points[0])
+        self.extend_run(points[1:])
+
+    def extend_run(self, points):
+        """Add points to the current run, starting one if needed"""
+        if len(points) == 0:
+            return
+        if not self.in_run:
+            self.write_run_start(self.pos)
+            self.in_run = True
+            self.n_runs += 1
+            self.n_points += 1
+        self.write_points(points)
+        self.n_points += len(points)
+        self.pos = points[-1]
+
+    def show(self):
+        """Finish and close the file"""
+        if self.in_run:
+            self.write_run_end()
+            self.in_run = False
+        self.write_footer()
+        self.file.close()
+        print(
+            "%s: %d paths, %d points written"
+            % (self.output, self.n_runs, self.n_points),
+            file=sys.stderr,
+        )
+
+    def write(self, text):
+        """Write text to the file"""
+        self.file.write(text.encode())
+
+    def write_header(self):
+        """Start the file"""
+        raise NotImplementedError
+
+    def write_run_start(self, p):
+        """Start a run at p"""
+        raise NotImplementedError
+
+    def write_points(self, points):
+        """Add points to the current run"""
+        raise NotImplementedError
+
+    def write_run_end(self):
+        """End the current run"""
+        raise NotImplementedError
+
+    def write_footer(self):
+        """End the file"""
+        raise NotImplementedError
+
+
+class SvgDrawEngine(VectorDrawEngine):
+    """Drawing engine writing an SVG file, one <path> per run"""
+
+    def write_header(self):
+        """SVG element and the style of all paths"""
+        self.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            + '<svg xmlns="http://www.w3.org/2000/svg" '
+            + 'width="%s" height="%s" viewBox="%s %s %s %s">\n'
+            % (
+                self.fmt(self.width),
+                self.fmt(self.height),
+                self.fmt(self.left),
+                self.fmt(self.top),
+                self.fmt(self.width),
+                self.fmt(self.height),
+            )
+            + '<g fill="none" stroke="black" stroke-width="1" '
+            + 'stroke-linecap="round" stroke-linejoin="round">\n'
+        )
+
+    def write_run_start(self, p):
+        """Path move to p"""
+        self.write('<path d="M%s %s L' % (self.fmt(p[0]), self.fmt(p[1])))
+
+    def write_points(self, points):
+        """Path lines, the points of a call on a line"""
+        fmt = self.fmt
+        self.write("\n" + " ".join("%s %s" % (fmt(x), fmt(y)) for (x, y) in points))
+
+    def write_run_end(self):
+        """End of the path element"""
+        self.write('"/>\n')
+
+    def write_footer(self):
+        """End of the SVG element"""
+        self.write("</g>\n</svg>\n")
+
+
+class PdfDrawEngine(VectorDrawEngine):
+    """Drawing engine writing a single page PDF file, 1 pixel being 1 pt.
+    The page content stream is written as the drawing goes, its length
+    being written in a separate object at the end"""
+
+    def __init__(self, bounds, output, precision=2):
+        self.offsets = []
+        self.stream_start = None
+        super().__init__(bounds, output, precision)
+
+    def begin_object(self):
+        """Start the next object, recording its offset for the xref table"""
+        self.offsets.append(self.file.tell())
+        self.write("%d 0 obj\n" % len(self.offsets))
+
+    def write_header(self):
+        """Catalog, pages, page, and start of the content stream. The
+        current transformation matrix flips the y axis, so that
+        coordinates are the same as in PIL"""
+        self.write("%PDF-1.4\n")
+        self.begin_object()
+        self.write("<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+        self.begin_object()
+        self.write("<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n")
+        self.begin_object()
+        self.write(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %s %s] /Contents 4 0 R >>\n"
+            % (self.fmt(self.width), self.fmt(self.height))
+            + "endobj\n"
+        )
+        self.begin_object()
+        self.write("<< /Length 5 0 R >>\nstream\n")
+        self.stream_start = self.file.tell()
+        self.write(
+            "1 0 0 -1 %s %s cm 1 J 1 j 1 w\n"
+            % (self.fmt(-self.left), self.fmt(self.height + self.top))
+        )
+
+    def write_run_start(self, p):
+        """Path move to p"""
+        self.write("%s %s m\n" % (self.fmt(p[0]), self.fmt(p[1])))
+
+    def write_points(self, points):
+        """Path lines"""
+        fmt = self.fmt
+        self.write("".join("%s %s l\n" % (fmt(x), fmt(y)) for (x, y) in points))
+
+    def write_run_end(self):
+        """Stroke the path"""
+        self.write("S\n")
+
+    def write_footer(self):
+        """End of the content stream, its length, xref table and trailer"""
+        length = self.file.tell() - self.stream_start
+        self.write("endstream\nendobj\n")
+        self.begin_object()
+        self.write("%d\nendobj\n" % length)
+        xref = self.file.tell()
+        self.write("xref\n0 %d\n0000000000 65535 f \n" % (len(self.offsets) + 1))
+        for offset in self.offsets:
+            self.write("%010d 00000 n \n" % offset)
+        self.write(
+            "trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(self.offsets) + 1, xref)
+        )
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+""" Base class for our parametric curves """
+from fractions import Fraction
+from functools import partial, reduce
+import math
+from math import ceil, gcd, hypot, lcm, pi, sqrt
+import sys
+import curve_cache
+from point_buffer import PointBuffer
+
+try:
+    import numpy
+except ImportError:  # Pure Python fallback
+    numpy = None
+
+MAX_DENOMINATOR = 1000  # Of frequencies given as floats
+
+
+def chord_deviation(p, a, b):
+    """Distance from p to the chord [a, b]"""
+    (dx, dy) = (b[0] - a[0], b[1] - a[1])
+    norm = hypot(dx, dy)
+    if norm == 0:
+        return hypot(p[0] - a[0], p[1] - a[1])
+    return abs((p[0] - a[0]) * dy - (p[1] - a[1]) * dx) / norm
+
+
+def rational(value):
+    """Get a frequency as a Fraction. A float is taken as the closest
+    fraction with a denominator up to MAX_DENOMINATOR (e.g. 1/3 for
+    1 / 3), its exact binary value making the curve period huge"""
+    if isinstance(value, float):
+        return Fraction(value).limit_denominator(MAX_DENOMINATOR)
+    return Fraction(value)
+
+
+def period_rotations(frequencies):
+    """Get the smallest number of rotations after which sinusoidal
+    terms of the given rational angular frequencies all come back
+    to their initial value: the inverse of the frequencies gcd.
+    Null frequencies (constant terms) are ignored"""
+    freqs = [abs(rational(f)) for f in frequencies if f != 0]
+    if not freqs:
+        return Fraction(1)
+    return Fraction(
+        reduce(lcm, (f.denominator for f in freqs)),
+        reduce(gcd, (f.numerator for f in freqs)),
+    )
+
+
+class Curve:
+    """A closed curve, described by its points for theta
+    in [0; 2 * pi * get_n_rotations()[. Curves that do not close
+    set closed to False"""
+
+    closed = True
+
+    def point(self, theta, lib=math):
+        """Get the curve point at theta. Mathematical functions are
+        taken from lib, so that passing numpy and an array of angles
+        computes all the points at once"""
+        raise NotImplementedError
+
+    def get_frequencies(self):
+        """Get the angular frequencies (rationals, in Fraction or int, see
+        rational() for floats) of the sinusoidal terms the curve
+        coordinates are sums of. Terms with a null amplitude must be
+        left out"""
+        raise NotImplementedError
+
+    def get_n_rotations(self):
+        """Get the exact (Fraction) number of rotations needed to
+        complete the curve, without tracing any part of it twice"""
+        return period_rotations(self.get_frequencies())
+
+    def get_n_oscillations(self):
+        """Get the number of oscillations of the fastest varying term
+        over the curve period. Used to sample the curve densely enough
+        not to miss any of its features"""
+        freqs = [abs(rational(f)) for f in self.get_frequencies()]
+        return max(freqs, default=1) * self.get_n_rotations()
+
+    def get_radius(self):
+        """Get the radius of a circle centered on the origin
+        and containing the curve"""
+        raise NotImplementedError
+
+    def compute(self, nstep):
+        """Returns a PointBuffer of nstep points corresponding to nstep
+        evenly spaced angular steps. Uses numpy when available"""
+        if numpy is None:
+            return self.compute_python(nstep)
+        return self.compute_numpy(nstep)
+
+    def compute_python(self, nstep):
+        """compute() in pure Python"""
+        t_max = 2 * pi * self.get_n_rotations()
+        return PointBuffer(self.point(t_max * i / nstep) for i in range(nstep))
+
+    def compute_numpy(self, nstep):
+        """compute() with numpy. The PointBuffer shares the memory
+        of to_numpy(), a contiguous (nstep, 2) array"""
+        t_max = 2 * pi * self.get_n_rotations()
+        (x, y) = self.point(t_max * numpy.arange(nstep) / nstep, numpy)
+        return PointBuffer(numpy.column_stack((x, y)))
+
+    def iter_chunks(self, nstep, chunk=4096):
+        """Generate the points of compute(nstep) in PointBuffers of at
+        most chunk points, so that memory use does not depend on nstep"""
+        t_max = 2 * pi * self.get_n_rotations()
+        for start in range(0, nstep, chunk):
+            stop = min(nstep, start + chunk)
+            if numpy is None:
+                yield PointBuffer(
+                    self.point(t_max * i / nstep) for i in range(start, stop)
+                )
+            else:
+                (x, y) = self.point(t_max * numpy.arange(start, stop) / nstep, numpy)
+                yield PointBuffer(numpy.column_stack((x, y)))
+
+    def compute_adaptive(self, tolerance, nstep=None, max_depth=16):
+        """Returns a PointBuffer of points such that the polyline going
+        through them deviates from the curve by less than tolerance
+        (approximately), see adaptive_steps"""
+        steps = self.adaptive_steps(tolerance, nstep, max_depth)
+        return PointBuffer(p for (_, p) in steps)
+
+    def adaptive_steps(self, tolerance, nstep=None, max_depth=16):
+        """Generate the (theta, point) of compute_adaptive, walking along
+        the curve. Each angular step is sized after the previous one so
+        that its chord deviates from the curve by about tolerance: the
+        deviation growing as the square of the step, a step deviating by
+        d is scaled by sqrt(tolerance / d), retried if d > tolerance.
+        The deviation is checked at the quarter points as well as the
+        middle one, as the middle of an S shaped arc lies on its chord.
+        Steps range from 1 / 2**max_depth to 4 times t_max / nstep (by
+        default nstep is 8 per oscillation of the curve), not to miss
+        any of its features"""
+        if nstep is None:
+            nstep = 8 * max(4, ceil(self.get_n_oscillations()))
+        t_max = 2 * pi * self.get_n_rotations()
+        (step, max_step) = (t_max / nstep, 4 * t_max / nstep)
+        min_step = step / 2**max_depth
+        (t_0, p_0) = (0, self.point(0))
+        while t_0 < t_max:
+            while True:
+                t_1 = t_0 + step
+                if t_max - t_1 < step / 4:  # Last step, not to end with a tiny one
+                    (step, t_1) = (t_max - t_0, t_max)
+                p_1 = self.point(t_1)
+                deviation = max(
+                    chord_deviation(self.point(t_0 + step * k / 4), p_0, p_1)
+                    for k in (1, 2, 3)
+                )
+                if deviation <= tolerance or step <= min_step:
+                    break
+                scale = max(0.25, 0.95 * sqrt(tolerance / deviation))
+                # Half the rest at most, not to be extended back to the end
+                step = max(min_step, min(step * scale, (t_max - t_0) / 2))
+            yield (t_0, p_0)
+            (t_0, p_0) = (t_1, p_1)
+            growth = 2 if deviation == 0 else 0.95 * sqrt(tolerance / deviation)
+            step = min(max_step, step * min(2, growth))
+
+
+def add_sampling_arguments(parser):
+    """Add the curve sampling options to an argparse parser"""
+    parser.add_argument("-p", help="number of points", default=256, type=int)
+    parser.add_argument(
+        "-A",
+        "--adaptive",
+        help="Sample the curve adaptively, so that it deviates from the drawing "
+        + "by at most this fraction of its size. -p is ignored",
+        type=float,
+    )
+    curve_cache.add_cache_arguments(parser)
+
+
+def sample(curve, args):
+    """Get curve points as requested by the parsed arguments, for
+    drawing_engine.draw_continuous. Evenly spaced points are streamed,
+    unless they are cached"""
+    cache = curve_cache.get_cache(args)
+    if args.adaptive is None:
+        if cache is None:
+            return partial(curve.iter_chunks, args.p)
+        (method, params) = ("compute", (args.p,))
+    else:
+        tolerance = args.adaptive * curve.get_radius()
+        if cache is None:
+            return curve.compute_adaptive(tolerance)
+        (method, params) = ("compute_adaptive", (tolerance,))
+    points = cache.compute(curve, method, *params)
+    print(cache.report(), file=sys.stderr)
+    return points
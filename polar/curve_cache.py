@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+""" On disk cache of computed curve points """
+from array import array
+import hashlib
+import inspect
+import os
+from point_buffer import PointBuffer
+
+DEFAULT_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "lineus",
+    "curves",
+)
+DEFAULT_SIZE = 64  # MiB
+
+
+def code_version(cls):
+    """Hash of the source files defining cls and its base classes, so
+    that cached points are not used anymore once the code changes"""
+    digest = hashlib.sha256()
+    for base in cls.__mro__[:-1]:  # Skip object
+        with open(inspect.getsourcefile(base), "rb") as src:
+            digest.update(src.read())
+    return digest.hexdigest()
+
+
+class CurveCache:
+    """Content addressed cache of curve points. An entry is keyed by the
+    curve class, its parameters (its attributes), the computing method
+    and its arguments, and the curve code version. Points are stored as
+    raw native doubles, one file per entry. Entries least recently used
+    are removed when the cache grows over max_size bytes"""
+
+    SUFFIX = ".pts"
+
+    def __init__(self, directory=DEFAULT_DIR, max_size=DEFAULT_SIZE * 2**20):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.versions = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, curve, method, *args):
+        """Get the key of the points computed by curve.method(*args)"""
+        cls = type(curve)
+        if cls not in self.versions:
+            self.versions[cls] = code_version(cls)
+        desc = repr(
+            (
+                cls.__qualname__,
+                sorted(vars(curve).items()),
+                method,
+                args,
+                self.versions[cls],
+            )
+        )
+        return hashlib.sha256(desc.encode()).hexdigest()
+
+    def path(self, key):
+        """Get the file of an entry"""
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        """Get the PointBuffer of an entry, None if not cached"""
+        try:
+            with open(self.path(key), "rb") as f:
+                data = array("d")
+                data.frombytes(f.read())
+        except (FileNotFoundError, ValueError):  # ValueError: truncated file
+            self.misses += 1
+            return None
+        try:
+            os.utime(self.path(key))  # Most recently used
+        except FileNotFoundError:  # Evicted by another process meanwhile
+            pass
+        self.hits += 1
+        return PointBuffer(data=data)
+
+    def put(self, key, points):
+        """Store points, then evict entries if needed"""
+        if not isinstance(points, PointBuffer):
+            points = PointBuffer(points)
+        tmp = "%s.%d.tmp" % (self.path(key), os.getpid())  # One per process
+        with open(tmp, "wb") as f:
+            f.write(points.data)
+        os.replace(tmp, self.path(key))
+        self.evict()
+
+    def compute(self, curve, method, *args):
+        """Get curve.method(*args) from the cache, computing and storing
+        it if needed"""
+        key = self.key(curve, method, *args)
+        points = self.get(key)
+        if points is None:
+            points = getattr(curve, method)(*args)
+            self.put(key, points)
+        return points
+
+    def entries(self):
+        """Get the (mtime, size, path) of the entries, oldest first"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:  # Evicted by another process
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        """Remove the least recently used entries until the cache
+        fits in max_size"""
+        entries = self.entries()
+        size = sum(e[1] for e in entries)
+        for (_, e_size, e_path) in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(e_path)
+            except FileNotFoundError:  # Removed by another process
+                pass
+            size -= e_size
+            self.evictions += 1
+
+    def stats(self):
+        """Get the cache statistics"""
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size": sum(e[1] for e in entries),
+        }
+
+    def report(self):
+        """Human readable statistics"""
+        return (
+            "Curve cache: %(hits)d hits, %(misses)d misses, %(evictions)d evictions, "
+            + "%(entries)d entries, %(size)d bytes"
+        ) % self.stats()
+
+
+def add_cache_arguments(parser):
+    """Add the curve cache options to an argparse parser"""
+    parser.add_argument(
+        "--cache",
+        help="Cache computed points in this directory (default " + DEFAULT_DIR + ")",
+        nargs="?",
+        const=DEFAULT_DIR,
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="Maximum cache size, in MiB",
+        default=DEFAULT_SIZE,
+        type=float,
+    )
+
+
+def get_cache(args):
+    """Get the cache requested by the parsed arguments, None if none"""
+    if args.cache is None:
+        return None
+    return CurveCache(args.cache, int(args.cache_size * 2**20))
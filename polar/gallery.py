@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+""" Contact sheet of a curve for a grid of parameters """
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from math import ceil, sqrt
+import os
+import sys
+import drawing_engine
+from curve import add_sampling_arguments
+from sweep import CURVES, parse_param, render_frame
+
+LABEL_HEIGHT = 14  # Pixels
+
+
+def gallery_cells(params):
+    """Get the parameters of each cell: all the combinations of
+    the parameter values"""
+    names = [name for (name, _) in params]
+    return [
+        dict(zip(names, values)) for values in product(*(v for (_, v) in params))
+    ]
+
+
+def format_param(param):
+    """Format a (name, value) parameter for a cell label"""
+    (name, value) = param
+    return "%s=%s" % (name, value if isinstance(value, str) else "%g" % value)
+
+
+def render_cell(job):
+    """Render a cell, in a worker process. Returns the image, or the
+    error message if the curve can't be drawn with these parameters"""
+    try:
+        return render_frame(job)
+    except Exception as err:
+        return "%s: %s" % (type(err).__name__, err)
+
+
+def contact_sheet(images, labels, columns, size):
+    """Assemble images of size pixels in a grid, with a label under each.
+    Cells without an image are left blank"""
+    from PIL import Image, ImageDraw
+
+    (width, height) = size
+    rows = ceil(len(images) / columns)
+    sheet = Image.new("L", (columns * width, rows * (height + LABEL_HEIGHT)), 255)
+    draw = ImageDraw.Draw(sheet)
+    for (i, (image, label)) in enumerate(zip(images, labels)):
+        (x, y) = ((i % columns) * width, (i // columns) * (height + LABEL_HEIGHT))
+        if image is not None:
+            sheet.paste(image, (x, y))
+        draw.text((x + 2, y + height), label, fill=0)
+    return sheet
+
+
+def parse_args():
+    """Basic argument parser"""
+    parser = argparse.ArgumentParser(
+        description="Render a curve for all the combinations of parameter values, "
+        + "in a single contact sheet image"
+    )
+    parser.add_argument("curve", help="Curve type", choices=sorted(CURVES))
+    parser.add_argument(
+        "params",
+        help="Curve parameters, name=value or name=start:stop:count, "
+        + "e.g. n=1:7:7 d=1:5:5",
+        nargs="+",
+        type=parse_param,
+    )
+    add_sampling_arguments(parser)
+    parser.add_argument(
+        "-s", help="size of the cells side, in pixels", default=128, type=int
+    )
+    drawing_engine.add_drawing_arguments(parser)
+    parser.add_argument(
+        "-o", "--output", help="Contact sheet image file", default="gallery.png"
+    )
+    parser.add_argument(
+        "-c",
+        "--columns",
+        help="Number of columns (default: number of values of the last parameter)",
+        type=int,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of worker processes (default: number of cores)",
+        default=os.cpu_count(),
+        type=int,
+    )
+    _args = parser.parse_args()
+    return _args
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    CELLS = gallery_cells(ARGS.params)
+    COLUMNS = ARGS.columns or len(ARGS.params[-1][1])
+    if COLUMNS == 1:
+        COLUMNS = ceil(sqrt(len(CELLS)))
+    with ProcessPoolExecutor(ARGS.jobs) as executor:
+        IMAGES = list(
+            executor.map(
+                render_cell,
+                [(i, p, None, ARGS) for (i, p) in enumerate(CELLS)],
+                chunksize=max(1, len(CELLS) // (4 * ARGS.jobs)),
+            )
+        )
+    LABELS = [" ".join(map(format_param, cell.items())) for cell in CELLS]
+    FAILED = 0
+    for (I, IMAGE) in enumerate(IMAGES):
+        if isinstance(IMAGE, str):
+            print("%s: %s" % (LABELS[I], IMAGE), file=sys.stderr)
+            (IMAGES[I], LABELS[I]) = (None, LABELS[I] + " (error)")
+            FAILED += 1
+    contact_sheet(IMAGES, LABELS, COLUMNS, (ARGS.s, ARGS.s)).save(ARGS.output)
+    print("%d cells rendered, %d failed" % (len(CELLS), FAILED), file=sys.stderr)
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 """ Lissajous curves """
 import argparse
-from math import pi, sin
+import math
+from math import pi
 import drawing_engine
+from curve import Curve, add_sampling_arguments, sample
 
 
-class Lissajous:
+class Lissajous(Curve):
     """Describe a Lissajous curve"""
 
     def __init__(self, a, b, phi):
@@ -16,22 +18,21 @@ class Lissajous:
         if phi < -0.5 or phi > 0.5:
             raise ValueError("phi must be in [-0.5;0.5]")
 
-        while (a % 2 == 0) and (b % 2 == 0):
-            a = a / 2
-            b = b / 2
-
         self.a = a
         self.b = b
         self.phi = phi
 
-    def compute(self, nstep):
-        """Compute Lissajous points"""
-        points = list()
-        phase = pi * self.phi
-        for i in range(nstep):
-            theta = 2 * pi * i / nstep
-            points.append((sin(self.a * theta + phase), sin(self.b * theta)))
-        return points
+    def get_frequencies(self):
+        """The curve is complete after 1 / gcd(a, b) rotation"""
+        return [self.a, self.b]
+
+    def get_radius(self):
+        """Lissajous curves fit in the [-1, 1] square"""
+        return 2**0.5
+
+    def point(self, theta, lib=math):
+        """Lissajous point at theta"""
+        return (lib.sin(self.a * theta + pi * self.phi), lib.sin(self.b * theta))
 
 
 def parse_args():
@@ -40,19 +41,23 @@ def parse_args():
     parser.add_argument("-a", help="a parameter", default=5, type=int)
     parser.add_argument("-b", help="b parameter", default=3, type=int)
     parser.add_argument("-P", help="phase parameter", default=0.5, type=float)
-    parser.add_argument("-p", help="number of points", default=256, type=int)
+    add_sampling_arguments(parser)
     parser.add_argument(
         "-s", help="size of PIL square canvas side, in pixels", default=256, type=int
     )
-    parser.add_argument(
-        "-e", help="Drawing engine", default="pil", type=str, choices=("pil", "lineus")
-    )
+    drawing_engine.add_engine_arguments(parser)
+    drawing_engine.add_drawing_arguments(parser)
     _args = parser.parse_args()
     return _args
 
 
-ARGS = parse_args()
-CANVAS = (0, ARGS.s, ARGS.s, 0)
-drawing_engine.draw_continuous(
-    Lissajous(ARGS.a, ARGS.b, ARGS.P).compute(ARGS.p), CANVAS, ARGS.e
-)
+if __name__ == "__main__":
+    ARGS = parse_args()
+    CANVAS = (0, ARGS.s, ARGS.s, 0)
+    drawing_engine.draw_continuous(
+        sample(Lissajous(ARGS.a, ARGS.b, ARGS.P), ARGS),
+        CANVAS,
+        ARGS.engine,
+        **drawing_engine.engine_options(ARGS),
+        **drawing_engine.drawing_options(ARGS)
+    )
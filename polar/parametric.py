@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+""" Generic parametric curves: expressions, harmonographs, epicycles """
+import argparse
+import ast
+from fractions import Fraction
+from functools import lru_cache
+import math
+from math import hypot, log, pi, radians
+import sys
+import drawing_engine
+from curve import Curve, add_sampling_arguments, rational, sample
+
+# Functions available in expressions, with the same name in math and numpy
+FUNCTIONS = (
+    "sin",
+    "cos",
+    "tan",
+    "atan",
+    "sinh",
+    "cosh",
+    "tanh",
+    "exp",
+    "log",
+    "sqrt",
+    "fabs",
+)
+CONSTANTS = {"pi": math.pi, "e": math.e}
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+
+def validate(node, source):
+    """Check that an expression only uses numbers, t, CONSTANTS,
+    FUNCTIONS calls and arithmetic operators"""
+    if isinstance(node, ast.Expression):
+        validate(node.body, source)
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, OPERATORS):
+        validate(node.left, source)
+        validate(node.right, source)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, OPERATORS):
+        validate(node.operand, source)
+    elif isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        pass
+    elif isinstance(node, ast.Name) and (node.id == "t" or node.id in CONSTANTS):
+        pass
+    elif (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in FUNCTIONS
+        and len(node.args) == 1
+        and not node.keywords
+    ):
+        validate(node.args[0], source)
+    else:
+        raise ValueError(
+            "Invalid expression %r: %s not allowed" % (source, ast.unparse(node))
+        )
+
+
+class FloatConstants(ast.NodeTransformer):
+    """Make integer constants floats, so that powers of constants like
+    9 ** 9 ** 9 ** 9 overflow at once instead of computing huge integers"""
+
+    def visit_Constant(self, node):
+        """Float constant"""
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+
+@lru_cache(maxsize=None)
+def compile_expression(source):
+    """Validate a function of t and compile it, once for all"""
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as err:
+        raise ValueError("Invalid expression %r: %s" % (source, err.msg)) from err
+    validate(tree, source)
+    tree = ast.fix_missing_locations(FloatConstants().visit(tree))
+    return compile(tree, "<" + source + ">", "eval")
+
+
+@lru_cache(maxsize=None)
+def environment(lib):
+    """Names available to expressions, functions being taken from lib"""
+    env = {name: getattr(lib, name) for name in FUNCTIONS}
+    env.update(CONSTANTS)
+    env["__builtins__"] = {}
+    return env
+
+
+class ExpressionCurve(Curve):
+    """Curve defined by the x(t) and y(t) expressions, t being the
+    angle. The curve is complete after rotations rotations or, if not
+    given, after the period of the frequencies of its sinusoidal terms
+    (see Curve.get_frequencies)"""
+
+    def __init__(self, x_expr, y_expr, frequencies=(), rotations=None):
+        self.x_expr = x_expr
+        self.y_expr = y_expr
+        self.frequencies = [rational(f) for f in frequencies if f != 0]
+        self.rotations = None if rotations is None else Fraction(rotations)
+        # Fail early on invalid expressions
+        compile_expression(x_expr)
+        compile_expression(y_expr)
+
+    def point(self, theta, lib=math):
+        """Evaluate the expressions, once for all angles if theta is a
+        numpy array and lib numpy"""
+        env = dict(environment(lib), t=theta)
+        # Constant expressions are broadcast to the shape of theta
+        return (
+            eval(compile_expression(self.x_expr), env) + 0 * theta,
+            eval(compile_expression(self.y_expr), env) + 0 * theta,
+        )
+
+    def get_frequencies(self):
+        """Frequencies given at construction"""
+        return self.frequencies
+
+    def get_n_rotations(self):
+        """Rotations given at construction, or the curve period"""
+        if self.rotations is not None:
+            return self.rotations
+        return super().get_n_rotations()
+
+    def get_radius(self):
+        """Sampled estimate"""
+        return max(hypot(x, y) for (x, y) in self.compute(4096))
+
+
+class Harmonograph(ExpressionCurve):
+    """Harmonograph: each coordinate is a sum of damped pendulums
+    a.sin(f.t + p).exp(-d.t), given as (a, f, p, d) terms, the phase p
+    being in radians. Damped harmonographs never close, they are drawn
+    for duration rotations, by default until their amplitude drops
+    to 1% of the initial one"""
+
+    def __init__(self, x_terms, y_terms, duration=None):
+        dampings = [d for (_, _, _, d) in x_terms + y_terms if d > 0]
+        self.closed = not dampings
+        if dampings and duration is None:
+            duration = log(100) / min(dampings) / (2 * pi)
+        self.amplitude = hypot(
+            sum(abs(a) for (a, _, _, _) in x_terms),
+            sum(abs(a) for (a, _, _, _) in y_terms),
+        )
+        super().__init__(
+            self.terms_expression(x_terms),
+            self.terms_expression(y_terms),
+            [f for (a, f, _, _) in x_terms + y_terms if a != 0],
+            duration,
+        )
+
+    @staticmethod
+    def terms_expression(terms):
+        """Expression of a sum of damped pendulums"""
+        return " + ".join(
+            "%r * sin(%r * t + %r) * exp(%r * t)" % (a, float(f), p, -d)
+            for (a, f, p, d) in terms
+        ) or "0"
+
+    def get_radius(self):
+        """Pendulums at their maximum amplitude"""
+        return self.amplitude
+
+
+class Epicycles(ExpressionCurve):
+    """Sum of rotating vectors (N-gear spirograph): each gear is a
+    (r, f, p) vector of length r, turning f times per rotation,
+    starting at angle p (radians)"""
+
+    def __init__(self, gears):
+        self.amplitude = sum(abs(r) for (r, _, _) in gears)
+        terms = [(r, float(f), p) for (r, f, p) in gears]
+        super().__init__(
+            " + ".join("%r * cos(%r * t + %r)" % term for term in terms) or "0",
+            " + ".join("%r * sin(%r * t + %r)" % term for term in terms) or "0",
+            [f for (r, f, _) in gears if r != 0],
+        )
+
+    def get_radius(self):
+        """All vectors aligned"""
+        return self.amplitude
+
+
+def parse_term(spec, n_fields):
+    """Parse a colon separated term: amplitude, frequency (rational, e.g.
+    3/2), then phase in degrees and damping, both optional"""
+    fields = spec.split(":")
+    if not 2 <= len(fields) <= n_fields:
+        raise argparse.ArgumentTypeError("Invalid term " + spec)
+    values = [float(fields[0]), Fraction(fields[1])]
+    values.append(radians(float(fields[2])) if len(fields) > 2 else 0.0)
+    if n_fields == 4:
+        values.append(float(fields[3]) if len(fields) > 3 else 0.0)
+    return tuple(values)
+
+
+def parse_args():
+    """Basic argument parser"""
+    parser = argparse.ArgumentParser(description="Drawing generic parametric curves")
+    subparsers = parser.add_subparsers(dest="curve", required=True)
+    expr = subparsers.add_parser("expr", help="x(t) and y(t) expressions")
+    expr.add_argument("x", help="x(t), e.g. 'sin(3 * t)'", type=str)
+    expr.add_argument("y", help="y(t), e.g. 'cos(5 * t) * sin(t)'", type=str)
+    expr.add_argument(
+        "-f",
+        "--frequencies",
+        help="Frequencies of the sinusoidal terms, to compute the curve period",
+        nargs="+",
+        default=(),
+        type=Fraction,
+    )
+    expr.add_argument(
+        "-r", "--rotations", help="Number of rotations to draw", type=Fraction
+    )
+    harmonograph = subparsers.add_parser("harmonograph", help="Damped pendulums")
+    harmonograph.add_argument(
+        "-x",
+        help="x pendulum, amplitude:frequency[:phase[:damping]]. Can be repeated",
+        action="append",
+        required=True,
+        type=lambda spec: parse_term(spec, 4),
+    )
+    harmonograph.add_argument(
+        "-y",
+        help="y pendulum, amplitude:frequency[:phase[:damping]]. Can be repeated",
+        action="append",
+        required=True,
+        type=lambda spec: parse_term(spec, 4),
+    )
+    harmonograph.add_argument(
+        "--duration", help="Number of rotations to draw", type=float
+    )
+    epicycles = subparsers.add_parser("epicycles", help="N-gear spirograph")
+    epicycles.add_argument(
+        "-g",
+        "--gear",
+        help="Gear, radius:frequency[:phase]. Can be repeated",
+        action="append",
+        required=True,
+        type=lambda spec: parse_term(spec, 3),
+    )
+    for sub in (expr, harmonograph, epicycles):
+        add_sampling_arguments(sub)
+        sub.add_argument(
+            "-s",
+            help="size of PIL square canvas side, in pixels",
+            default=256,
+            type=int,
+        )
+        drawing_engine.add_engine_arguments(sub)
+        drawing_engine.add_drawing_arguments(sub)
+    _args = parser.parse_args()
+    return _args
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    CANVAS = (0, ARGS.s, ARGS.s, 0)
+    try:
+        if ARGS.curve == "expr":
+            CURVE = ExpressionCurve(ARGS.x, ARGS.y, ARGS.frequencies, ARGS.rotations)
+        elif ARGS.curve == "harmonograph":
+            CURVE = Harmonograph(ARGS.x, ARGS.y, ARGS.duration)
+        else:
+            CURVE = Epicycles(ARGS.gear)
+        drawing_engine.draw_continuous(
+            sample(CURVE, ARGS),
+            CANVAS,
+            ARGS.engine,
+            closed=CURVE.closed,
+            **drawing_engine.engine_options(ARGS),
+            **drawing_engine.drawing_options(ARGS)
+        )
+    except ValueError as err:  # Invalid expression or degenerate curve
+        sys.exit(str(err))
+    except ArithmeticError as err:
+        sys.exit("Can't compute the curve points: %s" % err)
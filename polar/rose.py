@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 """ Rhodonea curves (roses) """
 import argparse
-from math import pi, sin, cos
+from fractions import Fraction
+import math
 import drawing_engine
+from curve import Curve, add_sampling_arguments, sample
 
 
-class Rose:
+class Rose(Curve):
     """Describe a rose"""
 
     def __init__(self, n, d):
@@ -15,34 +17,27 @@ class Rose:
             raise TypeError("d must be an integer")
         g = gcd(n, d)
 
-        self.n = n / g
-        self.d = d / g
+        self.n = n // g
+        self.d = d // g
+        self.k = self.n / self.d
 
-    def get_n_rotations(self):
-        """Get number of rotations needed to complete the rose"""
-        # k is an integer. If even, one full rotation is enough. If odd
-        # one half is enough
-        if self.n % self.d == 0:
-            k = self.n / self.d
-            if k % 2 == 0:
-                return 1
-            return 0.5
+    def get_frequencies(self):
+        """cos(k.t).cos(t) and cos(k.t).sin(t) are sums of sinusoids
+        of frequencies k + 1 and k - 1. Both n and d odd means both
+        frequencies are even multiples of 1/d: the rose is complete
+        after d/2 rotations, otherwise after d rotations"""
+        return [Fraction(self.n + self.d, self.d), Fraction(self.n - self.d, self.d)]
 
-        # k is a rational. If both n and d are odd, we need d/2 rotations.
-        # else we need d rotations
-        if (self.n % 2 == 1) and (self.d % 2 == 1):
-            return self.d / 2
-        return self.d
+    def get_radius(self):
+        """Roses fit in the unit circle"""
+        return 1
 
-    def compute(self, nstep):
-        """Compute rose points"""
-        points = []
-        n_rot = self.get_n_rotations()
-        k = self.n / self.d
-        for i in range(nstep):
-            theta = 2 * pi * n_rot * i / nstep
-            points.append((cos(k * theta) * cos(theta), cos(k * theta) * sin(theta)))
-        return points
+    def point(self, theta, lib=math):
+        """Rose point at theta"""
+        return (
+            lib.cos(self.k * theta) * lib.cos(theta),
+            lib.cos(self.k * theta) * lib.sin(theta),
+        )
 
 
 def gcd(x, y):
@@ -57,17 +52,23 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Playing with rhodoneas (roses)")
     parser.add_argument("-n", help="n parameter (k=n/d)", default=5, type=int)
     parser.add_argument("-d", help="d parameter (k=n/d)", default=3, type=int)
-    parser.add_argument("-p", help="number of points", default=256, type=int)
+    add_sampling_arguments(parser)
     parser.add_argument(
         "-s", help="size of PIL square canvas side, in pixels", default=256, type=int
     )
-    parser.add_argument(
-        "-e", help="Drawing engine", default="pil", type=str, choices=("pil", "lineus")
-    )
+    drawing_engine.add_engine_arguments(parser)
+    drawing_engine.add_drawing_arguments(parser)
     _args = parser.parse_args()
     return _args
 
 
-ARGS = parse_args()
-CANVAS = (0, ARGS.s, ARGS.s, 0)
-drawing_engine.draw_continuous(Rose(ARGS.n, ARGS.d).compute(ARGS.p), CANVAS, ARGS.e)
+if __name__ == "__main__":
+    ARGS = parse_args()
+    CANVAS = (0, ARGS.s, ARGS.s, 0)
+    drawing_engine.draw_continuous(
+        sample(Rose(ARGS.n, ARGS.d), ARGS),
+        CANVAS,
+        ARGS.engine,
+        **drawing_engine.engine_options(ARGS),
+        **drawing_engine.drawing_options(ARGS)
+    )
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 """ Simple roulette computation """
 import argparse
-from math import pi, cos, sin
+from fractions import Fraction
+import math
+from math import gcd
 import drawing_engine
+from curve import Curve, add_sampling_arguments, sample
 
 
-class Cycloidal:
+class Cycloidal(Curve):
     """Main class for our cycloids"""
 
     def __init__(self, R, r, d):
@@ -22,62 +25,61 @@ class Cycloidal:
         """Get number of cusps (sharp corners)"""
         if self.d != self.r:
             return 0
-        if self.r % self.R == 0:
-            return 1
-        if self.R % self.r == 0:
-            return self.R / self.r
-        return self.R
-
-    def get_n_rotations(self):
-        """Get number of rotations of the outer circle"""
-        if self.R % self.r == 0:
-            return 1
-        if self.r % self.R == 0:
-            return self.r / self.R
-        return self.r
-
-    def compute(self, nstep):
-        """Returns nstep points corresponding to nstep evenly
-        spaced angular steps"""
+        return self.R // gcd(self.R, self.r)
+
+    def get_center_radius(self):
+        """Get the radius of the circle followed by the center
+        of the rolling circle"""
         raise NotImplementedError
 
+    def get_radius(self):
+        """Rolling circle center + pen distance"""
+        return abs(self.get_center_radius()) + abs(self.d)
+
+    def get_frequencies(self):
+        """The rolling circle center turns once per rotation, the pen
+        turns around it (R -/+ r) / r times: the curve is complete after
+        r / gcd(R, r) rotations"""
+        c_r = self.get_center_radius()
+        if c_r == 0:  # Pen does not move
+            return []
+        if self.d == 0:  # Pen on the rolling circle center
+            return [1]
+        return [1, Fraction(c_r, self.r)]
+
 
 class Hypotrochoid(Cycloidal):
     """Hypotrochoid"""
 
-    def compute(self, nstep):
-        points = []
-        n_rot = self.get_n_rotations()
-        for i in range(nstep):
-            theta = 2 * pi * n_rot * i / nstep
-            points.append(
-                (
-                    self.r * (self.k - 1) * cos(theta)
-                    + self.d * cos((self.k - 1) * theta),
-                    self.r * (self.k - 1) * sin(theta)
-                    - self.d * sin((self.k - 1) * theta),
-                )
-            )
-        return points
+    def get_center_radius(self):
+        """R - r"""
+        return self.R - self.r
+
+    def point(self, theta, lib=math):
+        """Hypotrochoid point at theta"""
+        return (
+            self.r * (self.k - 1) * lib.cos(theta)
+            + self.d * lib.cos((self.k - 1) * theta),
+            self.r * (self.k - 1) * lib.sin(theta)
+            - self.d * lib.sin((self.k - 1) * theta),
+        )
 
 
 class Epitrochoid(Cycloidal):
     """Epitrochoid"""
 
-    def compute(self, nstep):
-        points = []
-        n_rot = self.get_n_rotations()
-        for i in range(nstep):
-            theta = 2 * pi * n_rot * i / nstep
-            points.append(
-                (
-                    self.r * (self.k + 1) * cos(theta)
-                    - self.d * cos((self.k + 1) * theta),
-                    self.r * (self.k + 1) * sin(theta)
-                    - self.d * sin((self.k + 1) * theta),
-                )
-            )
-        return points
+    def get_center_radius(self):
+        """R + r"""
+        return self.R + self.r
+
+    def point(self, theta, lib=math):
+        """Epitrochoid point at theta"""
+        return (
+            self.r * (self.k + 1) * lib.cos(theta)
+            - self.d * lib.cos((self.k + 1) * theta),
+            self.r * (self.k + 1) * lib.sin(theta)
+            - self.d * lib.sin((self.k + 1) * theta),
+        )
 
 
 class Hypocycloid(Hypotrochoid):
@@ -102,27 +104,35 @@ def parse_args():
     parser.add_argument(
         "-d", help="Distance of point from circle 2 center", default=5.0, type=float
     )
-    parser.add_argument("-p", help="number of points", default=256, type=int)
+    add_sampling_arguments(parser)
     parser.add_argument(
         "-s", help="size of PIL square canvas side, in pixels", default=256, type=int
     )
     parser.add_argument(
         "-t", help="type of cycloid", default="ht", type=str, choices=("ht", "et")
     )
-    parser.add_argument(
-        "-e", help="Drawing engine", default="pil", type=str, choices=("pil", "lineus")
-    )
+    drawing_engine.add_engine_arguments(parser)
+    drawing_engine.add_drawing_arguments(parser)
     _args = parser.parse_args()
     return _args
 
 
-ARGS = parse_args()
-CANVAS = (0, ARGS.s, ARGS.s, 0)
-if ARGS.t == "ht":
-    drawing_engine.draw_continuous(
-        Hypotrochoid(ARGS.R, ARGS.r, ARGS.d).compute(ARGS.p), CANVAS, ARGS.e
-    )
-elif ARGS.t == "et":
-    drawing_engine.draw_continuous(
-        Epitrochoid(ARGS.R, ARGS.r, ARGS.d).compute(ARGS.p), CANVAS, ARGS.e
-    )
+if __name__ == "__main__":
+    ARGS = parse_args()
+    CANVAS = (0, ARGS.s, ARGS.s, 0)
+    if ARGS.t == "ht":
+        drawing_engine.draw_continuous(
+            sample(Hypotrochoid(ARGS.R, ARGS.r, ARGS.d), ARGS),
+            CANVAS,
+            ARGS.engine,
+            **drawing_engine.engine_options(ARGS),
+            **drawing_engine.drawing_options(ARGS)
+        )
+    elif ARGS.t == "et":
+        drawing_engine.draw_continuous(
+            sample(Epitrochoid(ARGS.R, ARGS.r, ARGS.d), ARGS),
+            CANVAS,
+            ARGS.engine,
+            **drawing_engine.engine_options(ARGS),
+            **drawing_engine.drawing_options(ARGS)
+        )
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+""" Render a curve over a range of parameters, in parallel """
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import importlib
+import os
+import sys
+import drawing_engine
+from curve import add_sampling_arguments, sample
+
+# Curve name -> (module, class)
+CURVES = {
+    "rose": ("rose", "Rose"),
+    "lissajous": ("lissajous", "Lissajous"),
+    "hypotrochoid": ("roulette", "Hypotrochoid"),
+    "epitrochoid": ("roulette", "Epitrochoid"),
+    "hypocycloid": ("roulette", "Hypocycloid"),
+    "epicycloid": ("roulette", "Epicycloid"),
+    "expr": ("parametric", "ExpressionCurve"),
+}
+
+
+def make_curve(name, params):
+    """Instantiate one of CURVES with the given keyword parameters"""
+    (module, cls) = CURVES[name]
+    return getattr(importlib.import_module(module), cls)(**params)
+
+
+def parse_value(value):
+    """Parse a parameter value: int, float or string (expression)"""
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_param(spec):
+    """Parse a name=value or name=start:stop:count parameter. Returns
+    (name, values), values being count evenly spaced values from start
+    to stop for a range, integers if start, stop and the step are"""
+    (name, sep, value) = spec.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError("Invalid parameter " + spec)
+    fields = value.split(":")
+    if len(fields) == 1:
+        return (name, [parse_value(value)])
+    if len(fields) != 3:
+        raise argparse.ArgumentTypeError("Invalid range " + spec)
+    (start, stop) = (parse_value(fields[0]), parse_value(fields[1]))
+    count = int(fields[2])
+    if count < 2:
+        return (name, [start])
+    integers = isinstance(start, int) and isinstance(stop, int)
+    if integers and (stop - start) % (count - 1) == 0:
+        step = (stop - start) // (count - 1)
+        return (name, [start + i * step for i in range(count)])
+    return (name, [start + (stop - start) * i / (count - 1) for i in range(count)])
+
+
+def sweep_frames(params):
+    """Get the parameters of each frame. All the ranges must have
+    the same length, single values are used for all frames"""
+    n_frames = max(len(values) for (_, values) in params)
+    for (name, values) in params:
+        if len(values) not in (1, n_frames):
+            raise ValueError("Ranges of different lengths: " + name)
+    return [
+        {name: values[i % len(values)] for (name, values) in params}
+        for i in range(n_frames)
+    ]
+
+
+def sweep_bbox(curve_name, frames):
+    """Get a bounding box containing the curves of all frames"""
+    radius = max(make_curve(curve_name, params).get_radius() for params in frames)
+    return (-radius, -radius, radius, radius)
+
+
+def render_frame(job):
+    """Render a frame, in a worker process. job is (frame number,
+    curve parameters, bounding box, parsed arguments), the drawing being
+    fitted to the canvas if the bounding box is None. Numbered frames are
+    saved by the worker, the others returned as grayscale images"""
+    (index, params, bbox, args) = job
+    curve = make_curve(args.curve, params)
+    draw_engine = drawing_engine.PilDrawEngine((0, args.s, args.s, 0))
+    drawing_engine.trace_continuous(
+        sample(curve, args),
+        draw_engine,
+        bbox=bbox,
+        closed=curve.closed,
+        **drawing_engine.drawing_options(args)
+    )
+    image = draw_engine.im.convert("L")
+    if "%" in args.output:
+        image.save(args.output % index)
+        return None
+    return image
+
+
+def parse_args():
+    """Basic argument parser"""
+    parser = argparse.ArgumentParser(
+        description="Render a curve over a range of parameters, as an animation "
+        + "or numbered images"
+    )
+    parser.add_argument("curve", help="Curve type", choices=sorted(CURVES))
+    parser.add_argument(
+        "params",
+        help="Curve parameters, name=value or name=start:stop:count, "
+        + "e.g. a=5 b=4 phi=-0.5:0.5:50",
+        nargs="+",
+        type=parse_param,
+    )
+    add_sampling_arguments(parser)
+    parser.add_argument(
+        "-s", help="size of the frames side, in pixels", default=256, type=int
+    )
+    drawing_engine.add_drawing_arguments(parser)
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Animated .gif or .png file, or numbered PNG files pattern "
+        + "(e.g. frame%%04d.png)",
+        default="sweep.gif",
+    )
+    parser.add_argument(
+        "--frame-time", help="Frame duration, in ms", default=50, type=int
+    )
+    parser.add_argument(
+        "--fit",
+        help="Fit each frame to the canvas, instead of using the same scale for all",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of worker processes (default: number of cores)",
+        default=os.cpu_count(),
+        type=int,
+    )
+    _args = parser.parse_args()
+    return _args
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    try:
+        FRAMES = sweep_frames(ARGS.params)
+    except ValueError as err:
+        sys.exit(str(err))
+    # Same scale for all frames
+    BBOX = None if ARGS.fit else sweep_bbox(ARGS.curve, FRAMES)
+    with ProcessPoolExecutor(ARGS.jobs) as executor:
+        IMAGES = list(
+            executor.map(
+                render_frame, [(i, p, BBOX, ARGS) for (i, p) in enumerate(FRAMES)]
+            )
+        )
+    if "%" not in ARGS.output:
+        IMAGES[0].save(
+            ARGS.output,
+            save_all=True,
+            append_images=IMAGES[1:],
+            duration=ARGS.frame_time,
+            loop=0,
+        )
+    print("%d frames rendered" % len(FRAMES), file=sys.stderr)
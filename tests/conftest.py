@@ -0,0 +1,8 @@
+"""Modules are imported as the scripts do, with drawing_engine, polar
+and writing in the path"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("drawing_engine", "polar", "writing"):
+    sys.path.insert(0, os.path.join(ROOT, directory))
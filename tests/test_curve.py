@@ -0,0 +1,54 @@
+"""Consistency of the pure Python and numpy curve computations"""
+from itertools import chain
+import pytest
+import curve as curve_module
+from lissajous import Lissajous
+from parametric import Epicycles, ExpressionCurve, Harmonograph
+from rose import Rose
+from roulette import Epicycloid, Epitrochoid, Hypocycloid, Hypotrochoid
+
+CURVES = [
+    Rose(3, 7),
+    Lissajous(3, 4, 0.25),
+    Hypotrochoid(7, 3, 5),
+    Epitrochoid(5, 3, 2),
+    Hypocycloid(4, 1),
+    Epicycloid(3, 1),
+    ExpressionCurve("sin(3 * t)", "cos(5 * t) * sin(t)", [3, 5, 1]),
+    Harmonograph([(1, 2, 0, 0.01)], [(1, 3, 0.5, 0.02)]),
+    Epicycles([(5, 1, 0), (3, -7 / 3, 0)]),
+]
+NSTEP = 1000
+
+
+def assert_same_points(points, expected):
+    """Same number of points, equal up to rounding errors"""
+    assert len(points) == len(expected)
+    for (p, q) in zip(points, expected):
+        assert p == pytest.approx(q, abs=1e-9)
+
+
+@pytest.mark.parametrize("curve", CURVES, ids=lambda c: type(c).__name__)
+def test_numpy_matches_python(curve):
+    pytest.importorskip("numpy")
+    assert_same_points(
+        curve.compute_numpy(NSTEP).tolist(), curve.compute_python(NSTEP).tolist()
+    )
+
+
+@pytest.mark.parametrize("curve", CURVES, ids=lambda c: type(c).__name__)
+def test_chunks_match_compute(curve):
+    chunks = list(curve.iter_chunks(NSTEP, chunk=128))
+    assert max(len(c) for c in chunks) == 128
+    assert_same_points(
+        list(chain.from_iterable(chunks)), curve.compute(NSTEP).tolist()
+    )
+
+
+@pytest.mark.parametrize("curve", CURVES, ids=lambda c: type(c).__name__)
+def test_python_chunks_match_compute(curve, monkeypatch):
+    monkeypatch.setattr(curve_module, "numpy", None)
+    chunks = curve.iter_chunks(NSTEP, chunk=128)
+    assert_same_points(
+        list(chain.from_iterable(chunks)), curve.compute_python(NSTEP).tolist()
+    )
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 """Base classes for glyphs and fonts"""
+from point_buffer import PointBuffer
+from stroke_scheduler import strokes_to_polylines
 
 
 class Glyph:
@@ -13,6 +15,7 @@ class Glyph:
         We compute width and height from strokes"""
         self.name = name
         self.strokes = strokes
+        self.polylines = None
         self.init_size()
 
     def get_width(self):
@@ -27,6 +30,14 @@ class Glyph:
         """Strokes getter"""
         return self.strokes
 
+    def get_polylines(self):
+        """Strokes as a list of PointBuffer polylines, built on first use"""
+        if self.polylines is None:
+            self.polylines = [
+                PointBuffer(p) for p in strokes_to_polylines(self.strokes)
+            ]
+        return self.polylines
+
     def init_size(self):
         """Initialize glyph height and width from its stroke list"""
         x_s, y_s = [], []
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Pre-rasterized glyphs, for fast raster previews of long texts"""
+from math import ceil, floor
+from drawing_engine import Transform, bounding_box, to_tuples
+
+PHASES = 4  # Glyph positions per pixel
+
+
+class GlyphAtlas:
+    """Bitmaps of the glyphs of a font, each rasterized once at a given
+    scale then pasted wherever the glyph appears. scale is the (x, y)
+    font units to pixels factors, y being negative for a canvas with y
+    increasing downward. With supersampling > 1, glyphs are drawn that
+    many times larger with lines as wide, then reduced: antialiased
+    bitmaps. Each glyph is rasterized for the PHASES sub-pixel positions
+    it is pasted at, at most PHASES * PHASES times"""
+
+    def __init__(self, scale, supersampling=1):
+        self.scale = scale
+        self.supersampling = supersampling
+        # (Glyph name, phase) -> (mask, offset from the glyph origin pixel)
+        self.bitmaps = {}
+
+    def get(self, glyph, phase=(0, 0)):
+        """Get the mask of a glyph (ink being 255) with its origin at
+        phase / PHASES pixels, and the offset of its top left corner
+        from the glyph origin pixel"""
+        bitmap = self.bitmaps.get((glyph.name, phase))
+        if bitmap is None:
+            bitmap = self.bitmaps[(glyph.name, phase)] = self.rasterize(glyph, phase)
+        return bitmap
+
+    def rasterize(self, glyph, phase):
+        """Draw the strokes of a glyph in a mask"""
+        from PIL import Image, ImageDraw
+
+        k = self.supersampling
+        scale = (
+            Transform()
+            .scale(self.scale[0] * k, self.scale[1] * k)
+            .translate(phase[0] * k / PHASES, phase[1] * k / PHASES)
+        )
+        polylines = [scale.apply(p) for p in glyph.get_polylines()]
+        boxes = [bounding_box(p) for p in polylines]
+        # One pixel margin for the line width, corners on the reduced grid
+        left = (floor(min(b[0] for b in boxes) / k) - 1) * k
+        top = (floor(min(b[1] for b in boxes) / k) - 1) * k
+        right = (ceil(max(b[2] for b in boxes) / k) + 2) * k
+        bottom = (ceil(max(b[3] for b in boxes) / k) + 2) * k
+        mask = Image.new("L", (right - left, bottom - top), 0)
+        draw = ImageDraw.Draw(mask)
+        shift = Transform().translate(-left, -top)
+        for polyline in polylines:
+            if len(polyline) > 1:
+                draw.line(
+                    to_tuples(shift.apply(polyline)), fill=255, width=k, joint="curve"
+                )
+        if k > 1:
+            mask = mask.reduce(k)
+        return (mask, (left // k, top // k))
+
+    def paste(self, image, glyph, origin, color=(0, 0, 0)):
+        """Paint a glyph in a PIL image, its origin being at
+        the origin pixel coordinates"""
+        (x, phase_x) = divmod(round(origin[0] * PHASES), PHASES)
+        (y, phase_y) = divmod(round(origin[1] * PHASES), PHASES)
+        (mask, (left, top)) = self.get(glyph, (phase_x, phase_y))
+        (x, y) = (x + left, y + top)
+        image.paste(color, (x, y, x + mask.width, y + mask.height), mask)
@@ -3,49 +3,82 @@
 import argparse
 import sys
 import drawing_engine
+import stroke_scheduler
 from fonts import cirth, ogham
+from glyph_atlas import GlyphAtlas
 
 
-def draw_ogham_base(b_box, fit_func, d_e, margin=0.05):
-    """Draw ogham base line"""
+def get_ogham_base(b_box, margin=0.05):
+    """Get ogham base line stroke"""
     x_c, y_c = (b_box[2] - b_box[0]) * margin / 2, (b_box[3] - b_box[1]) * margin / 2
     end_line_x = (b_box[2] - b_box[0]) * (1 - margin / 2.0)
-    trace_strokes(((x_c, y_c, end_line_x, y_c),), (0, 1), fit_func, d_e)
-
-
-def trace_strokes(strokes, offset, fit_func, d_e):
-    """Trace a stroke"""
-    f_f = lambda x, y: fit_func(
-        (
-            x + offset[0],
-            y + offset[1],
-        )
-    )
-    for stroke in strokes:
-        point0 = f_f(stroke[0], stroke[1])
-        if len(stroke) == 2:
-            d_e.draw_line(point0)
-        else:
-            point1 = f_f(stroke[2], stroke[3])
-            d_e.draw_line(point0, point1)
-
-
-def trace_text(glyph_seq, canvas, d_e, margin=0.05):
-    """Trace a text"""
+    return ((x_c, y_c, end_line_x, y_c),)
+
+
+def trace_polylines(polylines, d_e):
+    """Trace a list of polylines"""
+    for polyline in polylines:
+        d_e.draw_polyline(polyline)
+
+
+def trace_text(
+    glyph_seq,
+    canvas,
+    d_e,
+    margin=0.05,
+    schedule="none",
+    time_limit=1.0,
+    rotation=0,
+    atlas=None,
+):
+    """Trace a text, rotated by rotation degrees counterclockwise.
+    Strokes can be reordered to reduce pen-up travel
+    using one of the stroke_scheduler.SCHEDULES methods.
+    If atlas (supersampling factor) is set, glyphs are pasted from a
+    GlyphAtlas instead, for unrotated texts on the PIL engine"""
     b_box = get_text_binding_box(glyph_seq, margin)
-    fit_func = drawing_engine.fit_func_factory(b_box, canvas)
+    rotate = drawing_engine.Transform().rotate(rotation)
+    fit = drawing_engine.fit_transform(rotate.bounds(b_box), canvas) @ rotate
+    glyph_atlas = None
+    if atlas and rotation == 0 and isinstance(d_e, drawing_engine.PilDrawEngine):
+        glyph_atlas = GlyphAtlas((fit.matrix[0], fit.matrix[4]), atlas)
+    elif atlas:
+        print(
+            "Glyph atlas only used for unrotated PIL previews, drawing strokes",
+            file=sys.stderr,
+        )
     x_c, y_c = (b_box[2] - b_box[0]) * margin / 2, (b_box[3] - b_box[1]) * margin / 2
     space = FONT.get_glyph_spacing()
+    polylines = []
     if FONT.name == "ogham":  # Ogham is special - draw a line
-        draw_ogham_base(b_box, fit_func, d_e, margin)
+        base_fit = fit @ drawing_engine.Transform().translate(0, 1)
+        for polyline in stroke_scheduler.strokes_to_polylines(
+            get_ogham_base(b_box, margin)
+        ):
+            polylines.append(base_fit.apply(polyline))
 
     # Now draw the characters
     for glyph in glyph_seq:
         if glyph is None:
             continue
-        trace_strokes(glyph.get_strokes(), (x_c, y_c), fit_func, d_e)
+        if glyph_atlas is not None:
+            glyph_atlas.paste(d_e.im, glyph, fit((x_c, y_c)))
+        else:
+            glyph_fit = fit @ drawing_engine.Transform().translate(x_c, y_c)
+            for polyline in glyph.get_polylines():
+                polylines.append(glyph_fit.apply(polyline))
         x_c += space + glyph.get_width()
 
+    if schedule != "none":
+        polylines, before, after = stroke_scheduler.schedule(
+            polylines, method=schedule, time_limit=time_limit
+        )
+        print(
+            "Pen-up travel: %.1f -> %.1f" % (before, after),
+            file=sys.stderr,
+        )
+    trace_polylines(polylines, d_e)
+
     d_e.show()
 
 
@@ -133,14 +166,7 @@ def parse_args():
         default=256,
         type=int,
     )
-    parser.add_argument(
-        "-e",
-        "--engine",
-        help="Drawing engine",
-        default="pil",
-        type=str,
-        choices=("pil", "lineus"),
-    )
+    drawing_engine.add_engine_arguments(parser)
     parser.add_argument(
         "-f",
         "--font",
@@ -149,20 +175,54 @@ def parse_args():
         type=str,
         choices=("ogham", "cirth", "cirth-d", "cirth-m", "cirth-e"),
     )
+    parser.add_argument(
+        "--rotate",
+        help="Rotate the text counterclockwise, in degrees",
+        default=0,
+        type=float,
+    )
+    parser.add_argument(
+        "--atlas",
+        help="Paste glyphs rasterized once in PIL previews instead of drawing "
+        + "each stroke, supersampled ATLAS times (default: 1)",
+        nargs="?",
+        const=1,
+        type=int,
+    )
+    parser.add_argument(
+        "-S",
+        "--schedule",
+        help="Stroke ordering, to reduce pen-up travel",
+        default="none",
+        type=str,
+        choices=stroke_scheduler.SCHEDULES,
+    )
+    parser.add_argument(
+        "--schedule-time",
+        help="Maximum time spent refining the stroke order, in seconds",
+        default=1.0,
+        type=float,
+    )
     parser.add_argument("text", help="Text to translate", type=str)
     _args = parser.parse_args()
     return _args
 
 
 ARGS = parse_args()
-if ARGS.engine == "pil":
-    # Reverse Y axis as Pil has it increasing downward
-    CANVAS = (0, ARGS.height, ARGS.width, 0)
-    DRAW_ENGINE = drawing_engine.PilDrawEngine(CANVAS)
-else:
-    CANVAS = drawing_engine.LineUsDrawEngine.LINEUS_CANVAS
-    DRAW_ENGINE = drawing_engine.LineUsDrawEngine(CANVAS)
+# Reverse Y axis as Pil has it increasing downward
+DRAW_ENGINE = drawing_engine.get_draw_engine(
+    ARGS.engine, (0, ARGS.height, ARGS.width, 0), **drawing_engine.engine_options(ARGS)
+)
+CANVAS = DRAW_ENGINE.bounds
 
 FONT = get_font(ARGS.font)
 GLYPH_SEQ = glyphize_text(ARGS.text)
-trace_text(GLYPH_SEQ, CANVAS, DRAW_ENGINE)
+trace_text(
+    GLYPH_SEQ,
+    CANVAS,
+    DRAW_ENGINE,
+    schedule=ARGS.schedule,
+    time_limit=ARGS.schedule_time,
+    rotation=ARGS.rotate,
+    atlas=ARGS.atlas,
+)